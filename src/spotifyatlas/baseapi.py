@@ -1,11 +1,36 @@
 from __future__ import annotations
-from typing import Dict
-from weakref import WeakValueDictionary
+from typing import Any, Callable, Dict, Optional, Union
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
 
 
 __all__ = ['BaseSpotifyAPI']
 
 
+# orjson and msgspec are optional dependencies (orjson is preferred). Both parse straight
+# from the response bytes, which is noticeably faster on big payloads like paginated
+# playlist tracks.
+# The request bodies are encoded the same way (requests takes bytes or str alike).
+if orjson is not None:
+    _loads: Callable[[bytes], Any] = orjson.loads
+    _dumps: Callable[[Any], Union[bytes, str]] = orjson.dumps
+elif msgspec is not None:
+    _loads = msgspec.json.decode
+    _dumps = msgspec.json.encode
+else:
+    _loads = json.loads
+    _dumps = json.dumps
+
+
 class BaseSpotifyAPI:
     """**Do not mind this class.** There are only two purposes for this base class.
 
@@ -16,11 +41,25 @@ class BaseSpotifyAPI:
     spotifyapi.py and datastructs.py. Now I can get access to the SpotifyAPI class
     from within a module that spotifyapi.py itself imports."""
 
-    # Weak ref dict prevents objects from never being GC'd from existence.
-    _instances: Dict[str, BaseSpotifyAPI] = WeakValueDictionary()
+    # A plain dict: the lookup happens every time a data structure is built, and most
+    # programs keep a single instance alive for their whole lifetime anyway. Use close()
+    # to drop an instance from here.
+    _instances: Dict[str, BaseSpotifyAPI] = {}
+
+    def __new__(cls, client_id: Optional[str] = None, *args, **kwargs):
+        instance = cls._instances.get(client_id)
+        if instance is not None:
+            return instance
+        return object.__new__(cls)
+
+    @classmethod
+    def lookup(cls, client_id: Optional[str]) -> Optional[BaseSpotifyAPI]:
+        """Return the existing instance of ``client_id`` (if any), without calling the
+        constructor."""
+        return cls._instances.get(client_id)
 
-    def __new__(cls, *args, **kwargs):
-        try:
-            return cls._instances[args[0]]
-        except KeyError:
-            return object.__new__(cls)
+    def close(self) -> None:
+        """Forget this instance, so that it can be garbage collected."""
+        for client_id, instance in list(self._instances.items()):
+            if instance is self:
+                del self._instances[client_id]
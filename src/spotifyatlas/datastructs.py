@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-from typing import Optional, Union, List, Iterator, TYPE_CHECKING
+from typing import Optional, Union, List, Dict, Iterable, Iterator, TYPE_CHECKING
 import itertools
-import requests
+import sys
 from .enums import ResultType
 from . import utils
 from .baseapi import BaseSpotifyAPI
 if TYPE_CHECKING:
+    import requests
     from .spotifyapi import SpotifyAPI
 
 
@@ -17,6 +18,11 @@ __all__ = ['SpotifyAPIException', 'SpotifyUserAuthException', 'Track',
 _OptStr = Optional[str]
 
 
+def _intern(value: _OptStr) -> _OptStr:
+    """``sys.intern()`` that lets ``None`` through, like the IDs of local files."""
+    return value if value is None else sys.intern(value)
+
+
 class SpotifyAPIException(Exception):
     """Exception class for errors with the Spotify API, both requests and responses."""
 
@@ -44,6 +50,9 @@ class SpotifyUserAuthException(Exception):
 class Track:
     """**Represents a Spotify track.**"""
 
+    # Tracks are created by the thousands, so no __dict__ for them.
+    __slots__ = ('id', 'name', 'artist', '_album', '_client_id', '_url', '_uri', '_repr')
+
     @classmethod
     def from_id(cls, _id: str) -> Track:
         """Initialize with only the ID. This will not retreive track details."""
@@ -54,6 +63,51 @@ class Track:
         """Initialize with the track's URL. This will not retreive track details."""
         return cls.from_id(url)
 
+    @classmethod
+    def _from_raw_many(cls, items: List[dict], client_id: _OptStr = None, *,
+                       album: Optional[Album] = None,
+                       artist_cache: Optional[Dict[str, Artist]] = None) -> List[Track]:
+        """Build tracks in bulk out of the JSON track objects of the API, writing the slots
+        directly instead of going through ``__init__`` for every one of them. Optionally
+        receive an album for when it is the same in all tracks, and a dict of artists by ID
+        to share between several calls."""
+
+        new = cls.__new__
+        intern = _intern
+        # The same artist tends to show up many times in a single page of results,
+        # so the tracks share their Artist object (and its interned name).
+        artists: Dict[str, Artist] = {} if artist_cache is None else artist_cache
+        resp: List[Track] = [None] * len(items)  # type: ignore
+        for i, item in enumerate(items):
+            raw_artist = item['artists'][0]
+            artist_id = raw_artist['id']
+            # Local files have no artist ID, so there is nothing to share them by.
+            track_artist = None if artist_id is None else artists.get(artist_id)
+            if track_artist is None:
+                track_artist = Artist(
+                    intern(artist_id), intern(raw_artist['name']), client_id=client_id)
+                if artist_id is not None:
+                    artists[artist_id] = track_artist
+            track_album = album
+            if track_album is None:
+                raw_album = item['album']
+                images = raw_album['images']
+                track_album = Album(
+                    raw_album['id'], raw_album['name'], track_artist,
+                    images[0]['url'] if images else None, client_id=client_id)
+
+            track = new(cls)
+            track.id = intern(item['id'])
+            track.name = item['name']
+            track.artist = track_artist
+            track._album = track_album
+            track._client_id = client_id
+            track._url = None
+            track._uri = None
+            track._repr = None
+            resp[i] = track
+        return resp
+
     def __init__(self, _id: str, name: _OptStr = None, artist: Optional[Artist] = None,
                  album: Optional[Album] = None, *, client_id: _OptStr = None) -> None:
         """**Represents a Spotify track.**
@@ -69,32 +123,57 @@ class Track:
         self.artist = artist
         self._album = album
         self._client_id = client_id
+        self._url = None
+        self._uri = None
+        self._repr = None
+
+    @property
+    def _api(self) -> Optional[SpotifyAPI]:
+        """The SpotifyAPI instance that made this object, for the lazy properties. None if
+        the object was made by hand. It is looked up instead of kept, so that the object
+        can be pickled or copied, and does not keep a closed instance alive."""
+        return BaseSpotifyAPI.lookup(self._client_id)
 
     @property
     def album(self) -> Optional[Album]:
-        if self._album is None and self._client_id:
-            # Sike, BaseSpotifyAPI actually returns the usual class
-            # see: baseapi.py
-            spoti: SpotifyAPI = BaseSpotifyAPI(self._client_id, '')
-            self._album = spoti.get_album_from_track(self)
+        if self._album is None:
+            api = self._api
+            if api is not None:
+                self._album = api.get_album_from_track(self)
         return self._album
 
     @property
     def url(self) -> str:
-        return f'https://open.spotify.com/track/{self.id}'
+        url = self._url
+        if url is None:
+            url = self._url = f'https://open.spotify.com/track/{self.id}'
+        return url
 
     @property
     def uri(self) -> str:
-        return f'spotify:track:{self.id}'
-
-    def __eq__(self, other: Track) -> bool:
+        # Built once per track, add_to_playlist() asks for every single one of them.
+        uri = self._uri
+        if uri is None:
+            uri = self._uri = f'spotify:track:{self.id}'
+        return uri
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, Track):
+            return NotImplemented
         return self.id == other.id
 
     def __repr__(self) -> str:
-        return f'<{self.__class__.__qualname__} ' \
-               f'name={repr(self.name)} ' \
-               f'artist={repr(self.artist.name)} ' \
-               f'id={repr(self.id)}>'
+        # Tracks are not modified after being parsed, and repr(playlist.tracks)
+        # can mean thousands of these.
+        r = self._repr
+        if r is None:
+            r = self._repr = f'<{self.__class__.__qualname__} ' \
+                             f'name={self.name!r} ' \
+                             f'artist={self.artist.name!r} ' \
+                             f'id={self.id!r}>'
+        return r
 
     def __str__(self) -> str:
         return f'{self.name} - {self.artist.name}'
@@ -109,6 +188,8 @@ class TrackCollection:
     This class is not intended to be used manually.
     """
 
+    __slots__ = ('id', 'type', 'name', '_image_url', '_tracks', '_client_id', '_url', '_uri')
+
     def __init__(self, _id: str, name: str, image_url: _OptStr = None,
                  tracks: Optional[List[Track]] = None, *, client_id: _OptStr = None) -> None:
         self.id = _id
@@ -117,33 +198,46 @@ class TrackCollection:
         self._image_url = image_url
         self._tracks = tracks
         self._client_id = client_id
+        self._url = None
+        self._uri = None
+
+    @property
+    def _api(self) -> Optional[SpotifyAPI]:
+        """See ``Track._api``."""
+        return BaseSpotifyAPI.lookup(self._client_id)
 
     def _get_tracks(self, force_update: bool = False) -> List[Track]:
         """Getter for the result tracks. Sometimes the TrackCollection will be initialized
         without tracks. In that case, they will be retreived in here by shamelessly
         accessing a SpotifyAPI object."""
 
-        if force_update or self._client_id and self._tracks is None:
-            spoti: SpotifyAPI = BaseSpotifyAPI(self._client_id, '')
-            # noinspection PyProtectedMember
-            self._tracks = spoti.get(self)._tracks
+        if force_update or self._tracks is None:
+            api = self._api
+            if force_update or api is not None:
+                # noinspection PyProtectedMember
+                self._tracks = api.get(self)._tracks
         return self._tracks
 
     @property
     def url(self) -> str:
-        return f'https://open.spotify.com/{self.type}/{self.id}'
+        url = self._url
+        if url is None:
+            url = self._url = f'https://open.spotify.com/{self.type.value}/{self.id}'
+        return url
 
     @property
     def uri(self) -> str:
-        return f'spotify:{self.type}:{self.id}'
+        uri = self._uri
+        if uri is None:
+            uri = self._uri = f'spotify:{self.type.value}:{self.id}'
+        return uri
 
     @property
     def image_url(self) -> _OptStr:
         """There are some cases (namely, empty playlists) where the
         ``image_url`` property will always be ``None``."""
         if self._image_url is None:
-            spoti: SpotifyAPI = BaseSpotifyAPI(self._client_id, '')
-            self._image_url = spoti.get(self)._image_url
+            self._image_url = self._api.get(self)._image_url
         return self._image_url
 
     def __getitem__(self, index: Union[int, slice]) -> Track:
@@ -158,18 +252,22 @@ class TrackCollection:
     def __bool__(self) -> bool:
         return True
 
-    def __eq__(self, other: TrackCollection) -> bool:
-        return self.id == other.id and str(self.type) == str(other.type)
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, TrackCollection):
+            return NotImplemented
+        return self.id == other.id and self.type is other.type
 
     def __repr__(self) -> str:
         if isinstance(self, Playlist):
-            owner_or_artist = f' owner={repr(self.owner.name)}'
+            owner_or_artist = f' owner={self.owner.name!r}'
         elif isinstance(self, Album):
-            owner_or_artist = f' artist={repr(self.artist.name)}'
+            owner_or_artist = f' artist={self.artist.name!r}'
         else:
             owner_or_artist = ''
         return f'<{self.__class__.__qualname__} ' \
-               f'name={repr(self.name)}{owner_or_artist} id={repr(self.id)}>'
+               f'name={self.name!r}{owner_or_artist} id={self.id!r}>'
 
     def __str__(self) -> str:
         return self.name
@@ -181,6 +279,8 @@ class TrackCollection:
 class Playlist(TrackCollection):
     """**Represents a Spotify playlist.**"""
 
+    __slots__ = ('owner',)
+
     def __init__(self, _id: str, name: str, owner: User, image_url: _OptStr = None,
                  tracks: Optional[List[Track]] = None, *, client_id: _OptStr = None) -> None:
         super(Playlist, self).__init__(_id, name, image_url, tracks, client_id=client_id)
@@ -195,7 +295,7 @@ class Playlist(TrackCollection):
         """Updates tracks in-place and also returns the new track list."""
         return self._get_tracks(force_update=True)
 
-    def add(self, tracks: List[Track], *, position: int = 0) -> None:
+    def add(self, tracks: Iterable[Track], *, position: int = 0) -> None:
         """**Add a list of tracks to a Spotify playlist.**
 
         The playlist must belong to you, or be collaborative.
@@ -204,18 +304,21 @@ class Playlist(TrackCollection):
         track or list of tracks at the end of a playlist, see ``append()`` and ``extend()``
         methods.
 
-        :param tracks: a list of ``Track``, containing the tracks to add
+        :param tracks: a list (or any iterable) of ``Track``, containing the tracks to add
         :param position: the index (starting at 0) where the tracks will be inserted
         :return: ``None``
         """
-        spoti: SpotifyAPI = BaseSpotifyAPI(self._client_id, '')
+        # Taken once, since the request would use up a generator before the update below.
+        tracks = list(tracks)
+        spoti: SpotifyAPI = self._api
         spoti.add_to_playlist(self, tracks, position=position)
         if self._tracks is None:
-            self._tracks = tracks.copy()
+            self._tracks = tracks
         else:
+            # A new list, like in clear(), for whoever holds on to the old one.
             self._tracks = self._tracks[:position] + tracks + self._tracks[position:]
 
-    def clear(self, *, make_copy: bool = False) -> Playlist:
+    def clear(self, *, make_copy: bool = False, use_loaded_tracks: bool = False) -> Playlist:
         """**Remove ALL the songs of the playlist.**
 
         The playlist must belong to you, or be collaborative.
@@ -226,11 +329,13 @@ class Playlist(TrackCollection):
         when clearing the playlist, and then fails while putting the tracks back.
 
         :param make_copy: whether to back up the playlist before clearing it
+        :param use_loaded_tracks: whether to return the tracks already loaded in this object
+            instead of fetching the playlist again (see ``SpotifyAPI.clear_playlist()``)
         :return: the ``Playlist`` as it was before being modified
         """
-        spoti: SpotifyAPI = BaseSpotifyAPI(self._client_id, '')
+        spoti: SpotifyAPI = self._api
         # Can throw exception, so call the function before updating self
-        resp = spoti.clear_playlist(self, make_copy=make_copy)
+        resp = spoti.clear_playlist(self, make_copy=make_copy, use_loaded_tracks=use_loaded_tracks)
         if self._tracks:
             # Not using clear(), a user may be using the playlist tracks
             # outside this function
@@ -242,7 +347,7 @@ class Playlist(TrackCollection):
 
         :return: the new ``Playlist`` object
         """
-        spoti: SpotifyAPI = BaseSpotifyAPI(self._client_id, '')
+        spoti: SpotifyAPI = self._api
         return spoti.duplicate_playlist(self)
 
     def append(self, track: Track) -> None:
@@ -280,15 +385,21 @@ class Playlist(TrackCollection):
         :param insert_before: insert the selection before the track at this index
         :return: ``None``
         """
-        spoti: SpotifyAPI = BaseSpotifyAPI(self._client_id, '')
+        spoti: SpotifyAPI = self._api
         spoti.rearrange_playlist(self, range_start, range_length, insert_before)
         if self._tracks is None:
             self.update_tracks()
         elif self._tracks:
-            _slice = self._tracks[range_start:(range_start + range_length)]
-            del self._tracks[range_start:(range_start + range_length)]
-            self._tracks = \
-                self._tracks[:insert_before] + _slice + self._tracks[insert_before:]
+            tracks = self._tracks
+            range_end = range_start + range_length
+            # insert_before refers to the positions before the move, like in the API.
+            # Moving the selection right next to itself changes nothing.
+            if insert_before > range_end:
+                self._tracks = tracks[:range_start] + tracks[range_end:insert_before] \
+                    + tracks[range_start:range_end] + tracks[insert_before:]
+            elif insert_before < range_start:
+                self._tracks = tracks[:insert_before] + tracks[range_start:range_end] \
+                    + tracks[insert_before:range_start] + tracks[range_end:]
 
     def __str__(self) -> str:
         return f'{self.name} - {self.owner.name}'
@@ -297,6 +408,8 @@ class Playlist(TrackCollection):
 class Album(TrackCollection):
     """**Represents a Spotify album.**"""
 
+    __slots__ = ('artist',)
+
     def __init__(self, _id: str, name: str, artist: Artist,
                  image_url: _OptStr = None, tracks: Optional[List[Track]] = None, *,
                  client_id: _OptStr = None) -> None:
@@ -315,6 +428,8 @@ class Album(TrackCollection):
 class Artist(TrackCollection):
     """**Represents a Spotify artist, alongside its top 10 tracks.**"""
 
+    __slots__ = ()
+
     def __init__(self, _id: str, name: str, image_url: _OptStr = None,
                  top_tracks: Optional[List[Track]] = None, *, client_id: _OptStr = None) -> None:
         super(Artist, self).__init__(_id, name, image_url, top_tracks, client_id=client_id)
@@ -332,38 +447,65 @@ class Artist(TrackCollection):
 class User:
     """**Represents a Spotify user.**"""
 
+    __slots__ = ('id', 'name', '_image_url', '_client_id', '_url', '_uri', '_repr')
+
     def __init__(self, _id: str, name: _OptStr, image_url: _OptStr = None, *,
                  client_id: _OptStr = None) -> None:
         self.id = _id
         self.name = name
         self._image_url = image_url
         self._client_id = client_id
+        self._url = None
+        self._uri = None
+        self._repr = None
+
+    @property
+    def _api(self) -> Optional[SpotifyAPI]:
+        """See ``Track._api``."""
+        return BaseSpotifyAPI.lookup(self._client_id)
 
     @property
     def url(self) -> str:
-        return f'https://open.spotify.com/user/{self.id}'
+        url = self._url
+        if url is None:
+            url = self._url = f'https://open.spotify.com/user/{self.id}'
+        return url
 
     @property
     def image_url(self) -> str:
-        if self._client_id and not self._image_url:
-            spoti: SpotifyAPI = BaseSpotifyAPI(self._client_id, '')
-            self._image_url = spoti.get_user(self)._image_url
+        if not self._image_url:
+            api = self._api
+            if api is not None:
+                self._image_url = api.get_user(self)._image_url
         return self._image_url
 
     @property
     def uri(self) -> str:
-        return f'spotify:user:{self.id}'
-
-    def __eq__(self, other: User) -> bool:
+        uri = self._uri
+        if uri is None:
+            uri = self._uri = f'spotify:user:{self.id}'
+        return uri
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, User):
+            return NotImplemented
         return self.id == other.id
 
     def __repr__(self) -> str:
-        return f'<{self.__class__.__qualname__} ' \
-               f'name={repr(self.name)} id={repr(self.id)}>'
+        r = self._repr
+        if r is None:
+            r = self._repr = f'<{self.__class__.__qualname__} ' \
+                             f'name={self.name!r} id={self.id!r}>'
+        return r
 
     def __str__(self) -> str:
         return f'{self.name}'
 
+    def __hash__(self) -> int:
+        return hash(self.id)
+
 
 class SearchResult:
     """**Represents a search result from the Spotify API.**
@@ -373,6 +515,8 @@ class SearchResult:
     ordered by relevance. The length of each list can vary from zero to twenty.
     """
 
+    __slots__ = ('query', 'albums', 'artists', 'playlists', 'tracks')
+
     def __init__(self, query: str, albums: List[Album], artists: List[Artist],
                  playlists: List[Playlist], tracks: List[Track]) -> None:
         self.query = query
@@ -397,11 +541,11 @@ class SearchResult:
         using a for loop.
         """
 
-        return filter(  # unholy itertools one-liner alert
-            lambda x: x is not None,
-            itertools.chain(*itertools.zip_longest(
-                self.albums, self.artists, self.playlists, self.tracks,
-                fillvalue=None)))
+        lists = (self.albums, self.artists, self.playlists, self.tracks)
+        for i in range(max(map(len, lists))):
+            for results in lists:
+                if i < len(results):
+                    yield results[i]
 
     def chain(self) -> Iterator[Union[Album, Artist, Playlist, Track]]:
         """**Make a single iterator out of all the search result lists (depth-first).**
@@ -419,16 +563,20 @@ class SearchResult:
         return itertools.chain(self.albums, self.artists, self.playlists, self.tracks)
 
     def __len__(self) -> int:
-        return sum(map(len, (self.albums, self.artists, self.playlists, self.tracks)))
+        return len(self.albums) + len(self.artists) + len(self.playlists) + len(self.tracks)
 
     def __iter__(self) -> Iterator[Union[Album, Artist, Playlist, Track]]:
         return self.flatten()
 
-    def __eq__(self, other: SearchResult) -> bool:
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, SearchResult):
+            return NotImplemented
         return self.query == other.query
 
     def __repr__(self) -> str:
-        return f'<{self.__class__.__qualname__} query={repr(self.query)}>'
+        return f'<{self.__class__.__qualname__} query={self.query!r}>'
 
     def __str__(self) -> str:
         return self.query
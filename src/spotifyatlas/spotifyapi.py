@@ -1,18 +1,22 @@
 from __future__ import annotations
 
-import urllib.parse
 from typing import Any, Optional, Union, \
-    Tuple, List, Dict, Iterator, Callable
+    Tuple, List, Dict, Set, Iterable, Iterator, Callable
 from importlib import resources
-import datetime
-import random
-import base64
+import os
 import json
+import time
+import secrets
+import base64
 import functools
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import webbrowser
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from . import utils
 from .enums import ResultType
@@ -21,7 +25,8 @@ from .datastructs import \
     SpotifyAPIException, SpotifyUserAuthException, Track, \
     TrackCollection, Playlist, Album, Artist, User, SearchResult,\
     _OptStr
-from .baseapi import BaseSpotifyAPI
+# noinspection PyProtectedMember
+from .baseapi import BaseSpotifyAPI, _loads, _dumps
 
 # if TYPE_CHECKING:
 #     spoti = ...
@@ -31,11 +36,20 @@ from .baseapi import BaseSpotifyAPI
 __all__ = ['SpotifyAPI']
 
 
-_redirect_page = resources.read_text("spotifyatlas.resources", "redirectpage.html")
 # _AnyTrack = Union[Track, Result]
 _LiterallyAnything = Union[Playlist, Album, Artist, Track, User]
 _AlmostAnything = Union[Playlist, Album, Artist, Track]
 
+# What search() looks for when no result types are given.
+_default_result_types = (ResultType.ALBUM, ResultType.ARTIST, ResultType.PLAYLIST, ResultType.TRACK)
+_default_result_types_str = ','.join(t.value for t in _default_result_types)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_redirect_page() -> bytes:
+    # Only read when the user auth flow first needs it, not on import.
+    return resources.read_binary("spotifyatlas.resources", "redirectpage.html")
+
 
 class SpotifyAPI(BaseSpotifyAPI):
     """**The meat-and-potatoes of this package.**
@@ -56,6 +70,25 @@ class SpotifyAPI(BaseSpotifyAPI):
     # The point of collecting all the primary functions in a single class is in order to share
     # many important attributes (mostly credentials, tokens and such).
 
+    # How many tracks, artists and albums the getters remember, in total, and for how
+    # many seconds each. Albums and artists hardly ever change. Playlists do, so they are
+    # not cached at all.
+    _cache_size = 30
+    _cache_ttls: Dict[str, float] = {
+        'get_track': 300,
+        'get_artist': 3600,
+        'get_album': 3600
+    }
+
+    # The method that get() dispatches to, for each kind of URL.
+    _getters: Dict[str, str] = {
+        'playlist': 'get_playlist',
+        'track': 'get_track',
+        'artist': 'get_artist',
+        'album': 'get_album',
+        'user': 'get_user'
+    }
+
     @staticmethod
     def _get_image_url(item: dict) -> _OptStr:
         """Return an optional image URL, with the JSON result of a request."""
@@ -68,37 +101,99 @@ class SpotifyAPI(BaseSpotifyAPI):
         except IndexError:
             return
 
-    @staticmethod
-    def _get_class_from_enum(_type: ResultType) -> type:
-        """Used to get the right constructor when iterating over specified types
-        in the _search() method."""
-        if _type == ResultType.PLAYLIST:
-            return Playlist
-        if _type == ResultType.ARTIST:
-            return Artist
-        return Album
-
     @staticmethod
     def _requires_user_auth(func: Callable) -> Callable:
         """Decorator that prepends a method with the user authorization flow."""
         @functools.wraps(func)
         def wrapper(self: SpotifyAPI, *args, **kwargs):
-            if not self._user_access_code:
+            # A refresh token from the token cache spares the browser altogether.
+            if not self._user_access_code and not self._user_refresh_token:
                 self._prompt_user_auth()
                 self._request_user_token()
             return func(self, *args, **kwargs)
 
         return wrapper
 
-    def __init__(self, client_id: str, client_secret: str, *, market: str = 'US') -> None:
+    @staticmethod
+    def _cached(func: Callable) -> Callable:
+        """Decorator that keeps the most recent results of a getter, by ID, for the time in
+        ``_cache_ttls``. Unlike ``lru_cache``, a URL, an ID and an object of the same item
+        share one entry, and concurrent calls for the same item wait for a single request."""
+        name = func.__name__
+
+        def lookup(self: SpotifyAPI, key: Tuple[str, str]) -> Optional[_AlmostAnything]:
+            # Must be called with the cache lock held.
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires, resp = entry
+            if time.monotonic() > expires:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return resp
+
+        @functools.wraps(func)
+        def wrapper(self: SpotifyAPI, url):
+            key = (name, utils.get_id(url))
+            with self._cache_lock:
+                resp = lookup(self, key)
+                if resp is not None:
+                    return resp
+                lock = self._fetch_locks.setdefault(key, threading.Lock())
+
+            with lock:
+                # Another thread may have made the request while this one waited.
+                with self._cache_lock:
+                    resp = lookup(self, key)
+                if resp is not None:
+                    return resp
+                try:
+                    resp = func(self, url)
+                except BaseException:
+                    # Nothing to cache. The threads waiting for this lock try for themselves.
+                    with self._cache_lock:
+                        if self._fetch_locks.get(key) is lock:
+                            del self._fetch_locks[key]
+                    raise
+                # The result is cached in the same breath as the lock is dropped, so no
+                # thread can miss both and make the same request again.
+                with self._cache_lock:
+                    self._cache[key] = (time.monotonic() + SpotifyAPI._cache_ttls[name], resp)
+                    if len(self._cache) > SpotifyAPI._cache_size:
+                        self._cache.popitem(last=False)
+                    if self._fetch_locks.get(key) is lock:
+                        del self._fetch_locks[key]
+            return resp
+
+        return wrapper
+
+    def __init__(self, client_id: str, client_secret: str, *, market: str = 'US',
+                 json_loads: Optional[Callable[[bytes], Any]] = None, max_workers: int = 8,
+                 session: Optional[requests.Session] = None,
+                 token_cache: Optional[Union[str, os.PathLike]] = None) -> None:
         """**Initialize the SpotifyAPI class.**
 
         :param client_id: the client ID of your application
         :param client_secret: the client secret of your application
         :param market: optionally, specify the market (like for artist's top tracks)
+        :param json_loads: optionally, the function used to decode response bodies (defaults
+            to ``orjson.loads`` or ``msgspec.json.decode`` if either is installed, otherwise
+            ``json.loads``)
+        :param max_workers: how many requests can be in flight at once, from any thread (when
+            fetching the pages of a big playlist, for example). Lower it if you run into
+            rate limits
+        :param session: optionally, the ``requests.Session`` to make the requests with, like a
+            ``requests_cache.CachedSession`` to keep the responses on disk. It is used as is,
+            and it is not closed by ``close()``
+        :param token_cache: optionally, the path of a file to keep the user's refresh token
+            in, so that the authorization page is only opened the first time. The file is
+            readable only by its owner, but anyone who can read it can act on behalf of the user
         """
 
-        if client_id in super(SpotifyAPI, self)._instances:
+        # BaseSpotifyAPI.__new__() hands back the existing instance of a client ID, which
+        # is already initialized.
+        if getattr(self, '_initialized', False):
             return
 
         if not client_id or not client_secret:
@@ -110,19 +205,61 @@ class SpotifyAPI(BaseSpotifyAPI):
         self.client_id = client_id
         self.client_secret = client_secret
         self.market = market
+        self._json_loads = _loads if json_loads is None else json_loads
+
+        # One session for every request, so the connections to the API are kept alive
+        # instead of doing a new TLS handshake each time. Rate limits (429) and server
+        # errors are retried, honoring the Retry-After header.
+        self._owns_session = session is None
+        if session is None:
+            session = requests.Session()
+            # Only GETs are retried. A POST or PUT that failed on the way back may have been
+            # applied already, and doing it again would add the same tracks twice, or move
+            # a range of them a second time.
+            retry = Retry(total=3, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=frozenset({'GET'}), respect_retry_after_header=True,
+                          raise_on_status=False)
+            # A connection for each request in flight (see _request()).
+            session.mount('https://', HTTPAdapter(
+                pool_connections=10, pool_maxsize=max_workers, max_retries=retry))
+            session.headers['User-Agent'] = \
+                f'spotifyatlas (+https://github.com/UmActually/spotifyatlas) {session.headers["User-Agent"]}'
+        self._session = session
+        # Threads are only started when there are several pages to fetch at once.
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._max_workers = max_workers
+        # The cap on requests in flight, whichever thread makes them, to stay clear of 429s.
+        self._request_slots = threading.BoundedSemaphore(max_workers)
+
+        # See _cached().
+        self._cache: OrderedDict[Tuple[str, str], Tuple[float, _AlmostAnything]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._fetch_locks: Dict[Tuple[str, str], threading.Lock] = {}
 
         client_creds = f'{self.client_id}:{self.client_secret}'
         self._client_creds_b64: str = base64.b64encode(client_creds.encode()).decode()
+        # For the token requests, which always send a form.
+        self._basic_auth_headers = {'Authorization': f'Basic {self._client_creds_b64}',
+                                    'Content-Type': 'application/x-www-form-urlencoded'}
 
         self._token = ''
         self._user_token = ''
+        # Authorization headers by content type, for the current tokens.
+        self._headers: Dict[_OptStr, Dict[str, str]] = {}
+        self._user_headers: Dict[_OptStr, Dict[str, str]] = {}
         self._user_refresh_token = ''
         self._user_access_code = ''
-        self._expires = datetime.datetime.now()
-        self._user_expires = datetime.datetime.now()
+        self._token_cache = token_cache
+        if token_cache is not None:
+            self._load_refresh_token()
+        # Deadlines on the monotonic clock, so they are cheap to check on every request
+        # and immune to changes of the system time.
+        self._expires = 0.0
+        self._user_expires = 0.0
         self._prefer_user_token = False
 
         super(SpotifyAPI, self)._instances[client_id] = self
+        self._initialized = True
 
     def get(self, url: Union[str, _LiterallyAnything, TrackCollection], *,
             result_type: Optional[Union[ResultType, str]] = None) -> _LiterallyAnything:
@@ -133,99 +270,116 @@ class SpotifyAPI(BaseSpotifyAPI):
         :return: a ``Playlist``, ``Album``, ``Artist``, ``Track``, or ``User`` object.
         """
 
-        invalid = False
         try:
             if url.startswith('https://open.spotify.com/'):
-                kind = url.split('/')[3]
+                kind, _, rest = url[25:].partition('/')
+                # Localized share links look like https://open.spotify.com/intl-es/track/...
+                if kind.startswith('intl-'):
+                    kind = rest.partition('/')[0]
             else:
-                invalid = result_type is None
                 kind = str(result_type)
         except AttributeError:
-            invalid = url.type is None
             kind = str(url.type)
 
-        if not invalid:
-            if kind == 'playlist':
-                return self.get_playlist(url)
-            if kind == 'track':
-                return self.get_track(url)
-            if kind == 'artist':
-                return self.get_artist(url)
-            if kind == 'album':
-                return self.get_album(url)
-            if kind == 'user':
-                return self.get_user(url)
+        # A 'None' kind (no result type) is not in the dict either.
+        getter = SpotifyAPI._getters.get(kind)
+        if getter is not None:
+            return getattr(self, getter)(url)
 
         raise ValueError('Spotify URL not valid. Please ensure the URL starts with '
                          'https://open.spotify.com/ or specify a result type.')
 
-    def _parse_result(self, items: List[dict], track_list: List[Track], *,
-                      _artist: Optional[Artist] = None, _album: Optional[Album] = None) -> None:
-        """Parse the resulting JSON of a request for a playlist, track, album, or artist's
-        tracks. Optionally receive an artist and an album for when these attributes are
-        the same in all tracks."""
-
-        if _artist is not None:
-            artist = _artist
-        if _album is not None:
-            album = _album
-
-        for item in items:
-            try:
-                track = item['track']
-            except KeyError:
-                track = item
-            _id = track['id']
-            name = track['name']
-            if _artist is None:
-                artist = Artist(
-                    track['artists'][0]['id'], track['artists'][0]['name'], None,
-                    client_id=self.client_id)
-            if _album is None:
-                # noinspection PyUnboundLocalVariable
-                album = Album(
-                    track['album']['id'], track['album']['name'], artist,
-                    SpotifyAPI._get_image_url(track), client_id=self.client_id)
-
-            # noinspection PyUnboundLocalVariable
-            track_list.append(Track(
-                _id, name, artist, album, client_id=self.client_id))
+    def get_many(self, urls: Iterable[Union[str, _LiterallyAnything, TrackCollection]], *,
+                 result_type: Optional[Union[ResultType, str]] = None) -> List[_LiterallyAnything]:
+        """**Like** ``get()`` **, for several things at once.** The requests are made
+        concurrently, so it takes about as long as the slowest of them. Together with any
+        other requests of this instance, no more than ``max_workers`` are in flight at once.
 
-    def _get_playlist_slice(self, url: str) -> Tuple[List[Dict], _OptStr]:
-        """Continue fetching the tracks of a playlist, in the case it has more than 100."""
+        :param urls: the URLs of the playlists, tracks, albums, artists, or users
+        :param result_type: when passing IDs instead of URLs, specify a ResultType.
+        :return: a list of ``Playlist``, ``Album``, ``Artist``, ``Track``, or ``User``
+            objects, in the same order
+        """
+        urls = list(urls)
+        if len(urls) < 2:
+            return [self.get(url, result_type=result_type) for url in urls]
+        # Not on self._executor: get_playlist() and others wait there for their own pages,
+        # which would never run if every worker was already waiting in here. The number of
+        # requests in flight is still capped by _request().
+        with ThreadPoolExecutor(max_workers=min(len(urls), self._max_workers)) as executor:
+            return list(executor.map(lambda url: self.get(url, result_type=result_type), urls))
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Make a request with the session, once fewer than ``max_workers`` requests are in
+        flight."""
+        with self._request_slots:
+            return self._session.request(method, url, **kwargs)
 
-        params = {'fields': 'next,items(track(id,name,artists(id,name),album(id,name,images)))'}
-        headers = self._user_auth_headers() if self._prefer_user_token else self._auth_headers()
-        r = requests.get(url, params=params, headers=headers)
+    def _parse_result(self, items: List[dict], track_list: List[Track], *,
+                      _album: Optional[Album] = None,
+                      _artists: Optional[Dict[str, Artist]] = None) -> None:
+        """Parse the resulting JSON of a request for a track, album, or artist's tracks.
+        Optionally receive an album for when it is the same in all tracks, or a dict of
+        known artists by ID."""
+
+        # noinspection PyProtectedMember
+        track_list.extend(Track._from_raw_many(
+            items, self.client_id, album=_album, artist_cache=_artists))
+
+    def _parse_playlist_result(self, items: List[dict], track_list: List[Track],
+                               artists: Dict[str, Artist]) -> None:
+        """Parse the resulting JSON of a request for a playlist's tracks, where every
+        track is wrapped in an item. ``artists`` is shared between all the pages of the
+        playlist."""
+
+        # noinspection PyProtectedMember
+        track_list.extend(Track._from_raw_many(
+            [item['track'] for item in items], self.client_id, artist_cache=artists))
+
+    def _get_playlist_slice(self, template: requests.PreparedRequest, settings: Dict[str, Any],
+                            offset: int) -> List[Dict]:
+        """Fetch the tracks of a playlist starting at ``offset``, in the case it has more than 100.
+        ``template`` is the request of a page, prepared once and without the offset, and
+        ``settings`` are the environment settings (proxies and such) to send it with."""
+
+        # Only the offset changes between pages, so the rest of the request (URL, query
+        # string, and merged headers) is not prepared again for each one of them.
+        request = template.copy()
+        request.url = f'{template.url}&offset={offset}'
+        with self._request_slots:
+            r = self._session.send(request, **settings)
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while retrieving a section of the playlist\'s tracks.')
 
-        result = r.json()
-        return result['items'], result['next']
+        return self._json_loads(r.content)['items']
 
-    def get_playlist(self, url: Union[str, Playlist]) -> Playlist:
+    def get_playlist(self, url: Union[str, Playlist], *, dedupe: bool = False) -> Playlist:
         """**Get the tracks and details of a public playlist.**
 
         This function only retrieves information of public playlists. For a private playlist of
         your account, use ``get_private_playlist()``.
 
         :param url: the URL or ID of the playlist
+        :param dedupe: whether to drop the tracks that appear more than once, keeping only the
+            first appearance of each one. The playlist then has fewer tracks than in
+            Spotify, and their positions no longer match. Local files (which have no ID)
+            are always kept
         :return: a ``Playlist``
         """
 
-        params = {'fields': 'name,owner(id,display_name,images),images,tracks(next,items('
+        params = {'fields': 'name,owner(id,display_name,images),images,tracks(total,items('
                             'track(id,name,artists(id,name),album(id,name,images))))'}
         playlist_id = utils.get_id(url)
 
         playlist: List[Track] = []
 
         headers = self._user_auth_headers() if self._prefer_user_token else self._auth_headers()
-        r = requests.get(f'https://api.spotify.com/v1/playlists/{playlist_id}',
-                         params=params, headers=headers)
+        r = self._request('GET', f'https://api.spotify.com/v1/playlists/{playlist_id}',
+                          params=params, headers=headers)
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while retrieving initial playlist tracks.')
 
-        result = r.json()
+        result = self._json_loads(r.content)
         tracks = result['tracks']
         items = tracks['items']
         image_url = SpotifyAPI._get_image_url(result)
@@ -233,29 +387,52 @@ class SpotifyAPI(BaseSpotifyAPI):
         owner = result['owner']
         owner = User(owner['id'], owner['display_name'], client_id=self.client_id)
 
-        _next = tracks['next']
-        self._parse_result(items, playlist)
-        while _next is not None:
-            items, _next = self._get_playlist_slice(_next)
-            self._parse_result(items, playlist)
+        # The same artist usually appears across many pages of a big playlist.
+        artists: Dict[str, Artist] = {}
+        self._parse_playlist_result(items, playlist, artists)
+
+        # The total is known from the first page, so the rest of the pages are
+        # requested all at once instead of following the 'next' links one by one.
+        offsets = range(len(items), tracks['total'], 100)
+        if offsets:
+            template = self._session.prepare_request(requests.Request(
+                'GET', f'https://api.spotify.com/v1/playlists/{playlist_id}/tracks', headers=headers,
+                params={'limit': 100, 'fields': 'items(track(id,name,artists(id,name),album(id,name,images)))'}))
+            settings = self._session.merge_environment_settings(template.url, {}, None, None, None)
+            pages = self._executor.map(
+                functools.partial(self._get_playlist_slice, template, settings), offsets)
+            for items in pages:
+                self._parse_playlist_result(items, playlist, artists)
+
+        if dedupe:
+            seen: Set[str] = set()
+            unique: List[Track] = []
+            for track in playlist:
+                if track.id is None:
+                    unique.append(track)
+                elif track.id not in seen:
+                    seen.add(track.id)
+                    unique.append(track)
+            playlist = unique
 
         return Playlist(
             playlist_id, result['name'], owner, image_url, playlist, client_id=self.client_id)
 
     @_requires_user_auth
-    def get_private_playlist(self, url: Union[str, Playlist]) -> Playlist:
+    def get_private_playlist(self, url: Union[str, Playlist], *, dedupe: bool = False) -> Playlist:
         """**Get the tracks and details of a public or private playlist.** Private playlists
         must belong to you, or have you as collaborator.
 
         :param url: the URL or ID of the album
+        :param dedupe: whether to drop repeated tracks (see ``get_playlist()``)
         :return: a ``Result``
         """
         self._prefer_user_token = True
-        resp = self.get_playlist(url)
+        resp = self.get_playlist(url, dedupe=dedupe)
         self._prefer_user_token = False
         return resp
 
-    @functools.lru_cache(maxsize=10)
+    @_cached
     def get_track(self, url: Union[str, Track]) -> Track:
         """**Get the details of a track.**
 
@@ -265,17 +442,17 @@ class SpotifyAPI(BaseSpotifyAPI):
 
         track_id = utils.get_id(url)
 
-        r = requests.get(f'https://api.spotify.com/v1/tracks/{track_id}', headers=self._auth_headers())
+        r = self._request('GET', f'https://api.spotify.com/v1/tracks/{track_id}', headers=self._auth_headers())
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while retrieving track details.')
 
-        result = r.json()
+        result = self._json_loads(r.content)
         track: List[Track] = []
         self._parse_result([result], track)
 
         return track[0]
 
-    @functools.lru_cache(maxsize=10)
+    @_cached
     def get_artist(self, url: Union[str, Artist]) -> Artist:
         """**Get the top 10 tracks and details of an artist.**
 
@@ -284,44 +461,47 @@ class SpotifyAPI(BaseSpotifyAPI):
         """
 
         artist_id = utils.get_id(url)
+        headers = self._auth_headers()
+
+        # The top tracks do not depend on the artist details, so both requests go at once.
+        top_tracks_future = self._executor.submit(
+            self._request, 'GET', f'https://api.spotify.com/v1/artists/{artist_id}/top-tracks',
+            params={'market': self.market}, headers=headers)
 
-        r = requests.get(f'https://api.spotify.com/v1/artists/{artist_id}', headers=self._auth_headers())
+        r = self._request('GET', f'https://api.spotify.com/v1/artists/{artist_id}', headers=headers)
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while retrieving artist details.')
 
-        result = r.json()
+        result = self._json_loads(r.content)
         name = result['name']
         image_url = SpotifyAPI._get_image_url(result)
 
-        r = requests.get(f'https://api.spotify.com/v1/artists/{artist_id}/top-tracks',
-                         params={'market': self.market}, headers=self._auth_headers())
+        r = top_tracks_future.result()
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while retrieving artist top tracks.')
 
-        result = r.json()
+        result = self._json_loads(r.content)
         top_tracks: List[Track] = []
 
         resp = Artist(artist_id, name, image_url, top_tracks, client_id=self.client_id)
 
-        # There are cases where it's not the same artist thoughout the artist's top tracks.
-        # (in a feature, for example)
-        same_artist = not any(track['artists'][0]['id'] != artist_id for track in result['tracks'])
-
-        self._parse_result(result['tracks'], top_tracks, _artist=resp if same_artist else None)
+        # There are cases where it's not the same artist thoughout the artist's top tracks
+        # (in a feature, for example), so the artist is only shared by the tracks it leads.
+        self._parse_result(result['tracks'], top_tracks, _artists={artist_id: resp})
 
         return resp
 
-    def _get_album_slice(self, url: str) -> Tuple[List[Dict], _OptStr]:
-        """Continue fetching the tracks of an album, in the (RARE) case it has more than 100."""
+    def _get_album_slice(self, album_id: str, offset: int, headers: Dict[str, str]) -> List[Dict]:
+        """Fetch the tracks of an album starting at ``offset``, in the (RARE) case it has more than 50."""
 
-        r = requests.get(url, headers=self._auth_headers())
+        r = self._request('GET', f'https://api.spotify.com/v1/albums/{album_id}/tracks',
+                          params={'offset': offset, 'limit': 50}, headers=headers)
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while retrieving a section of the album\'s tracks.')
 
-        result = r.json()
-        return result['items'], result['next']
+        return self._json_loads(r.content)['items']
 
-    @functools.lru_cache(maxsize=10)
+    @_cached
     def get_album(self, url: Union[str, Album]) -> Album:
         """**Get the tracks and details of an album.**
 
@@ -331,17 +511,23 @@ class SpotifyAPI(BaseSpotifyAPI):
 
         album_id = utils.get_id(url)
 
-        album: List[Track] = []
-
         # Primera slice y request
-        r = requests.get(f'https://api.spotify.com/v1/albums/{album_id}', headers=self._auth_headers())
+        headers = self._auth_headers()
+        r = self._request('GET', f'https://api.spotify.com/v1/albums/{album_id}', headers=headers)
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while retrieving initial album tracks.')
 
-        result = r.json()
+        return self._parse_album(self._json_loads(r.content), headers)
+
+    def _parse_album(self, result: dict, headers: Dict[str, str]) -> Album:
+        """Build an album out of the JSON result of a request, fetching the rest of its
+        tracks if they did not fit in the first page."""
+
+        album_id = result['id']
+        album: List[Track] = []
+
         tracks = result['tracks']
         items = tracks['items']
-        _next = tracks['next']
         name = result['name']
         artist_id = result['artists'][0]['id']
 
@@ -351,19 +537,99 @@ class SpotifyAPI(BaseSpotifyAPI):
             album_id, name, artist, SpotifyAPI._get_image_url(result), album,
             client_id=self.client_id)
 
-        same_artist = not any(track['artists'][0]['id'] != artist_id for track in items)
-
         # Each of the album's tracks will have the same album object, which is
-        # also the return value of this function.
-        self._parse_result(
-            items, album, _artist=artist if same_artist else None, _album=resp)
-        while _next is not None:
-            items, _next = self._get_album_slice(_next)
-            self._parse_result(
-                items, album, _artist=artist if same_artist else None, _album=resp)
+        # also the return value of this function. The tracks by the album's artist
+        # (usually all of them) share its object too, checked track by track.
+        artists = {artist_id: artist}
+        self._parse_result(items, album, _album=resp, _artists=artists)
+
+        # Same as in get_playlist(), the rest of the pages are requested all at once.
+        offsets = range(len(items), tracks['total'], 50)
+        if offsets:
+            pages = self._executor.map(
+                functools.partial(self._get_album_slice, album_id, headers=headers), offsets)
+            for items in pages:
+                self._parse_result(items, album, _album=resp, _artists=artists)
 
         return resp
 
+    def _get_several(self, endpoint: str, ids: Iterable[Union[str, Any]],
+                     batch_size: int) -> Iterator[Optional[dict]]:
+        """Yield the JSON objects of several items of the same kind, fetched in batches from
+        the ``/v1/{endpoint}?ids=`` endpoint, in the same order. Items that do not exist are
+        ``None``."""
+
+        ids = [utils.get_id(_id) for _id in ids]
+        for start in range(0, len(ids), batch_size):
+            r = self._request(
+                'GET', f'https://api.spotify.com/v1/{endpoint}',
+                params={'ids': ','.join(ids[start:start + batch_size])}, headers=self._auth_headers())
+            if r.status_code >= 400:
+                raise SpotifyAPIException(r, f'Error ocurred while retrieving a batch of {endpoint}.')
+
+            yield from self._json_loads(r.content)[endpoint]
+
+    def get_tracks(self, urls: Iterable[Union[str, Track]]) -> List[Optional[Track]]:
+        """**Get the details of several tracks**, with one request for every 50 of them.
+
+        :param urls: the URLs or IDs of the tracks
+        :return: a list of ``Track``, in the same order. Tracks that do not exist are
+            ``None``, so that the positions still match
+        """
+        results = list(self._get_several('tracks', urls, 50))
+        tracks: List[Track] = []
+        self._parse_result([result for result in results if result is not None], tracks)
+        found = iter(tracks)
+        return [None if result is None else next(found) for result in results]
+
+    def get_artists(self, urls: Iterable[Union[str, Artist]]) -> List[Optional[Artist]]:
+        """**Get the details of several artists**, with one request for every 50 of them.
+        Unlike ``get_artist()``, their top tracks are only retrieved when accessed.
+
+        :param urls: the URLs or IDs of the artists
+        :return: a list of ``Artist``, in the same order. Artists that do not exist are
+            ``None``
+        """
+        return [None if result is None else
+                Artist(result['id'], result['name'], SpotifyAPI._get_image_url(result),
+                       client_id=self.client_id)
+                for result in self._get_several('artists', urls, 50)]
+
+    def prefetch_artists(self, items: Iterable[Union[Track, Artist]]) -> None:
+        """**Fill in the image URLs of many artists at once**, with one request for every 50
+        of them. The artists of a playlist come without an image, so otherwise each
+        ``artist.image_url`` makes a request of its own.
+
+        :param items: the tracks (like the ones of a ``Playlist``) or artists to fill in
+        """
+        # The artist objects of a playlist are shared between its tracks, but artists made
+        # elsewhere may be different objects with the same ID.
+        pending: Dict[str, List[Artist]] = {}
+        for item in items:
+            artist = item if isinstance(item, Artist) else item.artist
+            # The artists of local files have no ID to look them up by.
+            # noinspection PyProtectedMember
+            if artist is not None and artist.id is not None and artist._image_url is None:
+                pending.setdefault(artist.id, []).append(artist)
+
+        for result in self._get_several('artists', pending, 50):
+            if result is None:
+                continue
+            image_url = SpotifyAPI._get_image_url(result)
+            for artist in pending.get(result['id'], ()):
+                artist._image_url = image_url
+
+    def get_albums(self, urls: Iterable[Union[str, Album]]) -> List[Optional[Album]]:
+        """**Get the tracks and details of several albums**, with one request for every 20
+        of them.
+
+        :param urls: the URLs or IDs of the albums
+        :return: a list of ``Album``, in the same order. Albums that do not exist are ``None``
+        """
+        headers = self._auth_headers()
+        return [None if result is None else self._parse_album(result, headers)
+                for result in self._get_several('albums', urls, 20)]
+
     def get_album_from_track(self, url: Union[str, Track]) -> Album:
         """**Get the album of a track.**
 
@@ -381,14 +647,10 @@ class SpotifyAPI(BaseSpotifyAPI):
         except AttributeError:
             pass
 
-        track_id = utils.get_id(url)
-
-        r = requests.get(f'https://api.spotify.com/v1/tracks/{track_id}', headers=self._auth_headers())
-        if r.status_code >= 400:
-            raise SpotifyAPIException(r, 'Error ocurred while retrieving track details.')
-
-        result = r.json()
-        album_id = result['album']['id']
+        # The track object of the API already comes with its album, and get_track()
+        # is cached, so this is usually one request less.
+        # noinspection PyProtectedMember
+        album_id = self.get_track(utils.get_id(url))._album.id
         return self.get_album(album_id)
 
     def get_user(self, url: Union[str, User]) -> User:
@@ -399,11 +661,11 @@ class SpotifyAPI(BaseSpotifyAPI):
         """
         user_id = utils.get_id(url)
 
-        r = requests.get(f'https://api.spotify.com/v1/users/{user_id}', headers=self._auth_headers())
+        r = self._request('GET', f'https://api.spotify.com/v1/users/{user_id}', headers=self._auth_headers())
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while retrieving user details.')
 
-        response = r.json()
+        response = self._json_loads(r.content)
         return User(
             user_id, response['display_name'], SpotifyAPI._get_image_url(response),
             client_id=self.client_id)
@@ -414,11 +676,11 @@ class SpotifyAPI(BaseSpotifyAPI):
 
         :return: a ``User``
         """
-        r = requests.get(f'https://api.spotify.com/v1/me', headers=self._user_auth_headers())
+        r = self._request('GET', f'https://api.spotify.com/v1/me', headers=self._user_auth_headers())
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while retrieving user details.')
 
-        response = r.json()
+        response = self._json_loads(r.content)
         return User(
             response['id'], response['display_name'], SpotifyAPI._get_image_url(response),
             client_id=self.client_id)
@@ -436,24 +698,30 @@ class SpotifyAPI(BaseSpotifyAPI):
             # No clue of what to search was given. This is your punishment.
             query = 'Never Gonna Give You Up'
 
-        params: Dict[str, str] = {'q': urllib.parse.quote(query)}
+        params: Dict[str, str] = {'q': query}
         if result_types:
             if any(t in result_types for t in (
                     ResultType.USER, ResultType.SHOW, ResultType.EPISODE, ResultType.AUDIOBOOK)):
                 raise NotImplementedError(
                     'Searching for users, shows, episodes, or audiobooks is not supported yet.')
+            params['type'] = ','.join(t.value for t in result_types)
         else:
-            result_types = [ResultType.ALBUM, ResultType.ARTIST, ResultType.PLAYLIST, ResultType.TRACK]
+            result_types = _default_result_types
+            params['type'] = _default_result_types_str
 
-        params['type'] = ','.join(map(str, result_types))
-        full_url = utils.add_params_to_url('https://api.spotify.com/v1/search', params)
+        if feeling_lucky:
+            # Only the top result of each type is used, so there is no point in the other 19.
+            params['limit'] = '1'
 
-        r = requests.get(full_url, headers=self._auth_headers())
+        # requests does the quoting of the query.
+        r = self._request(
+            'GET', 'https://api.spotify.com/v1/search', params=params, headers=self._auth_headers())
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while performing search.')
 
-        result: Dict[str, Any] = r.json()
-        kwargs: Dict[str, Any] = {}
+        result: Dict[str, Any] = self._json_loads(r.content)
+        # The types that were not searched for stay empty.
+        kwargs: Dict[str, Any] = {'albums': [], 'artists': [], 'playlists': [], 'tracks': []}
 
         def iterate_results(_type: ResultType) -> Iterator[dict]:
             _items = result[f'{_type}s']['items']
@@ -550,44 +818,37 @@ class SpotifyAPI(BaseSpotifyAPI):
         return self._search(query, [result_type], True)
 
     @_requires_user_auth
-    def add_to_playlist(self, url: Union[str, Playlist], tracks: List[Track], position: int = 0) -> None:
+    def add_to_playlist(self, url: Union[str, Playlist], tracks: Iterable[Track], position: int = 0) -> None:
         """**Add a list of tracks to a playlist.**
 
         The playlist must belong to you, or be collaborative. You can also add tracks
         from a playlist object with ``playlist.add()``.
 
         :param url: the URL or ID of the playlist.
-        :param tracks: a list of ``Track``, containing the tracks to add
+        :param tracks: a list (or any iterable) of ``Track``, containing the tracks to add
         :param position: the index (starting at 0) where the tracks will be inserted
         :return: ``None``
         """
         playlist_id = utils.get_id(url)
 
-        uris: List[str] = []
-        last_pos = position
-
-        def add_slice() -> None:
+        # The API takes up to 100 tracks per request. Taking the batches with islice()
+        # means that any iterable of tracks works, not only lists.
+        tracks = iter(tracks)
+        while True:
+            batch = list(itertools.islice(tracks, 100))
+            if not batch:
+                break
             headers = self._user_auth_headers(content_type='application/json')
-            data = json.dumps({'uris': uris, 'position': last_pos})
-            uris.clear()
-
-            r = requests.post(
-                f'https://api.spotify.com/v1/playlists/{playlist_id}/tracks', headers=headers, data=data)
+            data = _dumps({'uris': [track.uri for track in batch], 'position': position})
+            r = self._request(
+                'POST', f'https://api.spotify.com/v1/playlists/{playlist_id}/tracks', headers=headers, data=data)
             if r.status_code >= 400:
                 raise SpotifyAPIException(r, 'Error ocurred while adding a batch of tracks to the playlist.')
-
-        for i, track in enumerate(tracks, 1):
-            uris.append(track.uri)
-            if i % 100 == 0:
-                add_slice()
-                uris.clear()
-                last_pos = i
-
-        if len(uris) != 0:
-            add_slice()
+            position += len(batch)
 
     @_requires_user_auth
-    def clear_playlist(self, url: Union[str, Playlist], *, make_copy: bool = False) -> Playlist:
+    def clear_playlist(self, url: Union[str, Playlist], *, make_copy: bool = False,
+                       use_loaded_tracks: bool = False) -> Playlist:
         """**Remove ALL the songs in a playlist.**
 
         The playlist must belong to you, or be collaborative.
@@ -600,6 +861,10 @@ class SpotifyAPI(BaseSpotifyAPI):
 
         :param url: the URL or ID of the playlist
         :param make_copy: whether to back up the playlist before clearing it
+        :param use_loaded_tracks: when ``url`` is a ``Playlist`` with its tracks already
+            loaded, return those instead of fetching the playlist again. This saves the
+            requests, but the return value is then the local view of the playlist (which may
+            be outdated, modified, or deduplicated), not a record of what was removed
         :return: the ``Playlist`` as it was before being modified
         """
         if make_copy:
@@ -607,26 +872,23 @@ class SpotifyAPI(BaseSpotifyAPI):
 
         playlist_id = utils.get_id(url)
 
-        resp = self.get_private_playlist(url)
-        tracks = resp.tracks
-        uris: List[Dict[str, str]] = []
-
-        def clear_slice() -> None:
-            headers = self._user_auth_headers(content_type='application/json')
-            data = json.dumps({'tracks': uris})
-            r = requests.delete(
-                f'https://api.spotify.com/v1/playlists/{playlist_id}/tracks', headers=headers, data=data)
-            if r.status_code >= 400:
-                raise SpotifyAPIException(r, 'Error ocurred while removing a batch of tracks from the playlist.')
-
-        for i, track in enumerate(tracks, 1):
-            uris.append({'uri': track.uri})
-            if i % 100 == 0:
-                clear_slice()
-                uris.clear()
+        # The tracks are copied, since the object itself is about to be emptied by
+        # Playlist.clear().
+        # noinspection PyProtectedMember
+        if use_loaded_tracks and isinstance(url, Playlist) and url._tracks is not None:
+            # noinspection PyProtectedMember
+            resp = Playlist(url.id, url.name, url.owner, url._image_url, list(url._tracks),
+                            client_id=self.client_id)
+        else:
+            resp = self.get_private_playlist(url)
 
-        if len(uris) != 0:
-            clear_slice()
+        # Replacing the items of the playlist with nothing clears it in a single request,
+        # regardless of its size.
+        r = self._request(
+            'PUT', f'https://api.spotify.com/v1/playlists/{playlist_id}/tracks', data=_dumps({'uris': []}),
+            headers=self._user_auth_headers(content_type='application/json'))
+        if r.status_code >= 400:
+            raise SpotifyAPIException(r, 'Error ocurred while removing the tracks from the playlist.')
 
         return resp
 
@@ -646,14 +908,14 @@ class SpotifyAPI(BaseSpotifyAPI):
         playlist_id = utils.get_id(url)
 
         headers = self._user_auth_headers(content_type='application/json')
-        data = json.dumps({
+        data = _dumps({
             'range_start': range_start,
             'insert_before': insert_before,
             'range_length': range_length
         })
 
-        r = requests.put(
-            f'https://api.spotify.com/v1/playlists/{playlist_id}/tracks', data=data, headers=headers)
+        r = self._request(
+            'PUT', f'https://api.spotify.com/v1/playlists/{playlist_id}/tracks', data=data, headers=headers)
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while changing the order of the tracks.')
 
@@ -680,13 +942,13 @@ class SpotifyAPI(BaseSpotifyAPI):
         if description:
             data['description'] = description
 
-        r = requests.post(
-            f'https://api.spotify.com/v1/users/{user_id}/playlists', data=json.dumps(data),
+        r = self._request(
+            'POST', f'https://api.spotify.com/v1/users/{user_id}/playlists', data=_dumps(data),
             headers=self._user_auth_headers(content_type='application/json'))
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while creating playlist.')
 
-        result = r.json()
+        result = self._json_loads(r.content)
         owner = result['owner']
         owner = User(owner['id'], owner['display_name'], client_id=self.client_id)
 
@@ -706,106 +968,161 @@ class SpotifyAPI(BaseSpotifyAPI):
 
     def get_genres(self) -> List[str]:
         """**Gets all available genre seeds.**"""
-        r = requests.get(
-            'https://api.spotify.com/v1/recommendations/available-genre-seeds',
+        r = self._request(
+            'GET', 'https://api.spotify.com/v1/recommendations/available-genre-seeds',
             headers=self._auth_headers(content_type='application/json'))
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while fetching genre seeds.')
 
-        return r.json()['genres']
+        return self._json_loads(r.content)['genres']
 
     def _auth_headers(self, content_type: _OptStr = None) -> Dict[str, str]:
         """Returns the authorization headers for many requests to the API.
         If necessary, token is updated.
         """
-        if datetime.datetime.now() > self._expires:
+        if time.monotonic() > self._expires:
             self.update_token()
-        headers = {'Authorization': f'Bearer {self._token}'}
-        if content_type is not None:
-            headers['Content-Type'] = content_type
+        # The dicts are kept until the token changes, so they must not be modified.
+        headers = self._headers.get(content_type)
+        if headers is None:
+            headers = {'Authorization': f'Bearer {self._token}'}
+            if content_type is not None:
+                headers['Content-Type'] = content_type
+            self._headers[content_type] = headers
         return headers
 
     def _user_auth_headers(self, content_type: _OptStr = None) -> Dict[str, str]:
         """Returns the authorization headers for to the API that need user
         permissions. If necessary, token is updated.
         """
-        if datetime.datetime.now() > self._user_expires:
+        if time.monotonic() > self._user_expires:
             self.update_user_token()
-        headers = {'Authorization': f'Bearer {self._user_token}'}
-        if content_type is not None:
-            headers['Content-Type'] = content_type
+        # The dicts are kept until the token changes, so they must not be modified.
+        headers = self._user_headers.get(content_type)
+        if headers is None:
+            headers = {'Authorization': f'Bearer {self._user_token}'}
+            if content_type is not None:
+                headers['Content-Type'] = content_type
+            self._user_headers[content_type] = headers
         return headers
 
     def update_token(self) -> None:
         """Update the Bearer token by sending a grant request with the client credentials."""
 
-        headers = {'Authorization': f'Basic {self._client_creds_b64}'}
-        data = {'grant_type': 'client_credentials'}
-
-        r = requests.post('https://accounts.spotify.com/api/token', headers=headers, data=data)
+        # The form never changes, so it is sent already encoded.
+        r = self._request(
+            'POST', 'https://accounts.spotify.com/api/token', headers=self._basic_auth_headers,
+            data=b'grant_type=client_credentials')
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while updating the app\'s Bearer token.')
 
-        response = r.json()
+        response = self._json_loads(r.content)
         self._token = response['access_token']
+        self._headers = {}
 
-        now = datetime.datetime.now()
-        self._expires = now + datetime.timedelta(seconds=response['expires_in'])
+        # A bit early, so that the token does not expire halfway through a request.
+        self._expires = time.monotonic() + response['expires_in'] - 30
 
     def update_user_token(self) -> None:
         """Update the user Bearer token by sending a grant request."""
 
-        if self._user_refresh_token:
+        if not self._user_refresh_token:
+            self._request_user_token()
+            return
+        try:
             self._refresh_user_token()
-        else:
+        except SpotifyAPIException as e:
+            # Without an access code, the refresh token came from the token cache, and may
+            # have been revoked since. Only then the user is asked again. Any other error
+            # (a rate limit, or a server error) leaves the saved token alone.
+            if self._user_access_code or not SpotifyAPI._is_invalid_grant(e.response):
+                raise
+            self._user_refresh_token = ''
+            self._prompt_user_auth()
             self._request_user_token()
 
+    @staticmethod
+    def _is_invalid_grant(r: Optional[requests.Response]) -> bool:
+        """Whether a token request was rejected because of a revoked or expired grant."""
+        if r is None or r.status_code != 400:
+            return False
+        try:
+            return _loads(r.content).get('error') == 'invalid_grant'
+        except (ValueError, AttributeError):
+            return False
+
     def _request_user_token(self) -> None:
         """Request the user Bearer token with the authorization code provided by the user
         authorization page.
         """
 
-        params = {
+        data = {
             'grant_type': 'authorization_code',
             'code': self._user_access_code,
             'redirect_uri': 'http://localhost:8000'
         }
 
-        full_url = utils.add_params_to_url('https://accounts.spotify.com/api/token', params)
-        headers = {'Authorization': f'Basic {self._client_creds_b64}',
-                   'Content-Type': 'application/x-www-form-urlencoded'}
-
-        r = requests.post(full_url, headers=headers)
+        # The form goes in the body.
+        r = self._request(
+            'POST', 'https://accounts.spotify.com/api/token', headers=self._basic_auth_headers, data=data)
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while requesting Bearer token after user login.')
 
-        response = r.json()
+        response = self._json_loads(r.content)
         self._user_token = response['access_token']
+        self._user_headers = {}
         self._user_refresh_token = response['refresh_token']
+        self._save_refresh_token()
 
-        now = datetime.datetime.now()
-        self._user_expires = now + datetime.timedelta(seconds=response['expires_in'])
+        self._user_expires = time.monotonic() + response['expires_in'] - 30
 
     def _refresh_user_token(self) -> None:
         """Update the user Bearer token by using the previous refresh token."""
 
-        params = {
+        data = {
             'grant_type': 'refresh_token',
             'refresh_token': self._user_refresh_token,
         }
 
-        full_url = utils.add_params_to_url('https://accounts.spotify.com/api/token', params)
-        headers = {'Authorization': f'Basic {self._client_creds_b64}'}
-
-        r = requests.post(full_url, headers=headers)
+        r = self._request(
+            'POST', 'https://accounts.spotify.com/api/token', headers=self._basic_auth_headers, data=data)
         if r.status_code >= 400:
             raise SpotifyAPIException(r, 'Error ocurred while refreshing the user\'s Bearer token.')
 
-        response = r.json()
+        response = self._json_loads(r.content)
         self._user_token = response['access_token']
+        self._user_headers = {}
+        # Spotify may rotate the refresh token too, in which case the old one stops working.
+        refresh_token = response.get('refresh_token')
+        if refresh_token and refresh_token != self._user_refresh_token:
+            self._user_refresh_token = refresh_token
+            self._save_refresh_token()
+
+        self._user_expires = time.monotonic() + response['expires_in'] - 30
+
+    def _load_refresh_token(self) -> None:
+        """Read the user's refresh token from the token cache, if it is there and belongs
+        to this client ID."""
+        try:
+            with open(self._token_cache, 'rb') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(cached, dict) and cached.get('client_id') == self.client_id:
+            self._user_refresh_token = cached.get('refresh_token') or ''
 
-        now = datetime.datetime.now()
-        self._user_expires = now + datetime.timedelta(seconds=response['expires_in'])
+    def _save_refresh_token(self) -> None:
+        """Write the user's refresh token to the token cache, if there is one."""
+        if self._token_cache is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self._token_cache))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # A new file is created with owner-only permissions from the start. The mode of an
+        # existing one is not touched by os.open(), so it is set before the token is written.
+        fd = os.open(self._token_cache, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.chmod(self._token_cache, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'client_id': self.client_id, 'refresh_token': self._user_refresh_token}, f)
 
     def _prompt_user_auth(self) -> None:
         """Open the Spotify authorization page in the default browser. The user is then
@@ -814,7 +1131,11 @@ class SpotifyAPI(BaseSpotifyAPI):
         a user token and use the API on behalf of the user.
         """
 
-        state = str(random.random())
+        # Only needed for this flow, so they stay out of the package import.
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        import webbrowser
+
+        state = secrets.token_urlsafe(16)
         full_url = utils.add_params_to_url('https://accounts.spotify.com/authorize', {
             'client_id': self.client_id,
             'response_type': 'code',
@@ -828,23 +1149,36 @@ class SpotifyAPI(BaseSpotifyAPI):
         class RedirectPage(BaseHTTPRequestHandler):
             def do_GET(self) -> None:
                 nonlocal params
+                # Browsers may also ask for things like /favicon.ico. Only the redirect
+                # comes with a query string.
+                if not self.path.startswith('/?'):
+                    self.send_response(204)
+                    self.end_headers()
+                    return
                 params = utils.parse_url_params(self.path)
                 self.send_response(200)
-                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                page = _get_redirect_page()
+                self.send_header('Content-Length', str(len(page)))
                 self.end_headers()
-                self.wfile.write(bytes(_redirect_page, 'utf-8'))
+                self.wfile.write(page)
 
             def log_message(self, *args: Any) -> None:
                 return
 
-        server = HTTPServer(("127.0.0.1", 8000), RedirectPage)
+        # Every connection gets its own thread, so a connection that the browser opens in
+        # advance (and never uses) does not block the redirect. The timeout lets the loop
+        # check for the parameters every now and then.
+        server = ThreadingHTTPServer(("127.0.0.1", 8000), RedirectPage)
+        server.timeout = 0.5
         webbrowser.open_new_tab(full_url)
-        server.handle_request()
+        while not params:
+            server.handle_request()
         server.server_close()
 
         if state != params['state']:
             raise SpotifyUserAuthException(
-                'The security "state" number that was generated randomly did not match '
+                'The security "state" string that was generated randomly did not match '
                 'with the received parameter after redirecting to local page. Please try '
                 'authorizing Spotify again.')
 
@@ -866,8 +1200,28 @@ class SpotifyAPI(BaseSpotifyAPI):
     def __eq__(self, other: SpotifyAPI) -> bool:
         return self.client_id == other.client_id
 
+    def close(self) -> None:
+        """**Release the connections and threads of this instance.**
+
+        The instance is also forgotten, so calling ``SpotifyAPI`` again with the same client ID
+        will make a new one. ``SpotifyAPI`` can be used as a context manager as well:
+
+            >>> with SpotifyAPI('<my-client-id>', '<my-client-secret>') as spoti:
+            ...     playlist = spoti.get('https://open.spotify.com/playlist/3wrUHfvsdnjiZ0kFJLvFOK')
+        """
+        self._executor.shutdown(wait=False)
+        if self._owns_session:
+            self._session.close()
+        super(SpotifyAPI, self).close()
+
+    def __enter__(self) -> SpotifyAPI:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
     def __repr__(self) -> str:
-        return f'<SpotifyAPI client_id={repr(self.client_id)}>'
+        return f'<SpotifyAPI client_id={self.client_id!r}>'
 
     def __hash__(self) -> int:
         return hash(self._client_creds_b64)
@@ -1,70 +1,61 @@
-from typing import Any, Optional, Union, Tuple, List, Dict
+from typing import Any, Optional, Union, Tuple, Dict
+import re
+from urllib.parse import urlencode, urlsplit, parse_qsl
 from ..enums import Genre
 
 
 __all__ = ['get_id', 'add_params_to_url', 'parse_url_params', 'advanced_search']
 
 
+# The last path segment of a share link, without the query string. IDs are not
+# length-checked on purpose: user IDs, for example, are not 22 characters long.
+_URL_ID_RE = re.compile(r'https://open\.spotify\.com/[^?#]*/([^/?#]+)')
+
+
 def get_id(url: Any) -> str:
     """Extract the ID from a Spotify share link, or an object."""
     try:
-        if url.startswith('https://open.spotify.com/'):
-            return url.split('/')[-1].split('?')[0]
-        if url.isalnum():
-            return url
-        raise ValueError('Spotify URL or ID not valid.')
-    except AttributeError:
+        match = _URL_ID_RE.match(url)
+    except TypeError:
         return url.id
+    if match is not None:
+        return match.group(1)
+    if url.isalnum():
+        return url
+    raise ValueError('Spotify URL or ID not valid.')
 
 
 def add_params_to_url(base_url: str, params: Dict[str, str]) -> str:
     """Translate a dict to a query string, which is added to ``base_url``."""
-    pairs: List[str] = []
-    for key, value in params.items():
-        pairs.append(str(key) + '=' + str(value))
-    return base_url + '?' + '&'.join(pairs)
+    return base_url + '?' + urlencode(params)
 
 
 def parse_url_params(url: str) -> Dict[str, str]:
     """Translate the URL's query string to a dict of parameters."""
-    params_str = url[2:]
-    resp = {}
-    for pair in params_str.split('&'):
-        try:
-            key, value = pair.split('=')
-            resp[key] = value
-        except ValueError:
-            pass
-    return resp
+    return dict(parse_qsl(urlsplit(url).query))
+
+
+def _format_option(name: str, value: Any) -> str:
+    """Format one advanced search option as ``name:value``."""
+    # for hipster and new params
+    # 'is True' is needed to actually test being boolean
+    if value is True:
+        return f'tag:{name}'
+    # for a year range
+    if isinstance(value, tuple):
+        return f'{name}:{value[0]}-{value[1]}'
+    return f'{name}:{value}'
 
 
 def _advanced_search(**kwargs) -> str:
     """This function exists in order to iterate through the arguments of the real
     advanced_search() function."""
 
-    options: List[str] = []
-    try:
-        query = kwargs.pop('q')
-        if query is not None:
-            options.append(query)
-    except KeyError:
-        pass
-    for name, value in kwargs.items():
-        if value is None:
-            continue
-        # for hipster and new params
-        # 'is True' is needed to actually test being boolean
-        elif value is True:
-            value = name
-            name = 'tag'
-        # for a year range
-        elif isinstance(value, tuple):
-            value = f'{value[0]}-{value[1]}'
-        options.append(f'{name}:{value}')
-
-    if not options:
-        return ''
-    return ' '.join(options)
+    query = kwargs.pop('q', None)
+    options = (_format_option(name, value) for name, value in kwargs.items() if value is not None)
+    if query is None:
+        return ' '.join(options)
+    return ' '.join((query, *options))
 
 
 # Boilerplate code alert
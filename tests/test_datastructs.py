@@ -1,6 +1,10 @@
 import os
+import sys
+import copy
+import pickle
+import subprocess
 import unittest
-from spotifyatlas import SpotifyAPI
+from spotifyatlas import SpotifyAPI, Track, Playlist, Album, Artist, User
 
 
 TEST_PLAYLIST = 'https://open.spotify.com/playlist/64RWbvkb4Q00ZROlpd6ItU'
@@ -61,3 +65,83 @@ class TestDataStructs(unittest.TestCase):
         # Metallica blacklist
         album = self.spoti.get_album(TEST_ALBUM_COLLAB)
         self.assertFalse(all(track.artist is artist for track in album))
+
+
+class TestRawTracks(unittest.TestCase):
+    """Offline tests for building tracks out of the JSON of the API."""
+
+    @staticmethod
+    def local_file(name: str, artist: str) -> dict:
+        # This is what a playlist item of a local file looks like.
+        return {'id': None, 'name': name, 'is_local': True,
+                'artists': [{'id': None, 'name': artist}],
+                'album': {'id': None, 'name': 'Some Album', 'images': []}}
+
+    def test_local_files(self) -> None:
+        spotify_track = {'id': '5fwSHlTEWpluwOM0Sxnh5k', 'name': 'Song',
+                         'artists': [{'id': '25uiPmTg16RbhZWAqwLBy5', 'name': 'Artist'}],
+                         'album': {'id': '2I0LPpmyvAwnXvCuBf3Pcy', 'name': 'Album', 'images': []}}
+        items = [self.local_file('Demo', 'Me'), spotify_track, self.local_file('Other Demo', 'You')]
+        # noinspection PyProtectedMember
+        tracks = Track._from_raw_many(items)
+
+        self.assertEqual(len(tracks), 3)
+        self.assertIsNone(tracks[0].id)
+        self.assertEqual(tracks[0].name, 'Demo')
+        self.assertEqual(tracks[1].id, '5fwSHlTEWpluwOM0Sxnh5k')
+        # Local artists have no ID, so they are not mixed up with each other.
+        self.assertEqual(tracks[0].artist.name, 'Me')
+        self.assertEqual(tracks[2].artist.name, 'You')
+        self.assertIsNot(tracks[0].artist, tracks[2].artist)
+
+
+class TestCopies(unittest.TestCase):
+    """Offline tests for pickling and copying the data structures."""
+
+    def test_pickle_and_copy(self) -> None:
+        spoti = SpotifyAPI('pickle-client-id', 'pickle-client-secret')
+        self.addCleanup(spoti.close)
+        client_id = spoti.client_id
+
+        artist = Artist('25uiPmTg16RbhZWAqwLBy5', 'Artist', client_id=client_id)
+        album = Album('2I0LPpmyvAwnXvCuBf3Pcy', 'Album', artist, 'https://i.scdn.co/image/x',
+                      [], client_id=client_id)
+        track = Track('5fwSHlTEWpluwOM0Sxnh5k', 'Song', artist, album, client_id=client_id)
+        owner = User('leocoronag', 'Leo', client_id=client_id)
+        playlist = Playlist('64RWbvkb4Q00ZROlpd6ItU', 'Playlist', owner, tracks=[track],
+                            client_id=client_id)
+
+        for obj in (track, album, artist, owner, playlist):
+            for clone in (pickle.loads(pickle.dumps(obj)), copy.deepcopy(obj), copy.copy(obj)):
+                self.assertEqual(clone, obj)
+                self.assertIs(clone._api, spoti)
+
+        clone = pickle.loads(pickle.dumps(playlist))
+        self.assertEqual(clone.tracks, [track])
+        self.assertEqual(clone[0].album, album)
+        self.assertEqual(clone.owner, owner)
+
+        # A closed instance is not kept alive by the objects it made.
+        spoti.close()
+        self.assertIsNone(track._api)
+        self.assertIsNone(clone._api)
+
+    def test_pickle_across_hash_seeds(self) -> None:
+        # Pickled by a process with a different hash seed, like a cache on disk would be.
+        code = ('import pickle, sys; from spotifyatlas import Track, Album, Artist, User; '
+                'artist = Artist("25uiPmTg16RbhZWAqwLBy5", "Artist"); '
+                'objs = [Track("5fwSHlTEWpluwOM0Sxnh5k", "Song", artist), artist, '
+                'Album("2I0LPpmyvAwnXvCuBf3Pcy", "Album", artist), User("leocoronag", "Leo")]; '
+                '[hash(obj) for obj in objs]; '
+                'sys.stdout.buffer.write(pickle.dumps(objs))')
+        env = dict(os.environ, PYTHONHASHSEED='1', PYTHONPATH=os.pathsep.join(sys.path))
+        objs = pickle.loads(subprocess.run(
+            [sys.executable, '-c', code], env=env, check=True, stdout=subprocess.PIPE).stdout)
+
+        artist = Artist('25uiPmTg16RbhZWAqwLBy5', 'Artist')
+        fresh = [Track('5fwSHlTEWpluwOM0Sxnh5k', 'Song', artist), artist,
+                 Album('2I0LPpmyvAwnXvCuBf3Pcy', 'Album', artist), User('leocoronag', 'Leo')]
+        for obj, other in zip(objs, fresh):
+            self.assertEqual(obj, other)
+            self.assertEqual(hash(obj), hash(other))
+            self.assertIn(obj, {other})
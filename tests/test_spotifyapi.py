@@ -1,7 +1,20 @@
 import os
+import sys
+import json
+import importlib.util
+import stat
+import time
+import tempfile
+import threading
 import unittest
+from unittest import mock
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl
+import requests
+from requests.adapters import HTTPAdapter
 from spotifyatlas import SpotifyAPI, SpotifyAPIException, ResultType, \
     Playlist, Track, Artist, Album, User
+from spotifyatlas import baseapi
 from spotifyatlas.baseapi import BaseSpotifyAPI
 
 
@@ -157,3 +170,500 @@ class TestSpotifyAPI(unittest.TestCase):
         tracks.sort(key=lambda t: t.artist.name.lower())
         playlist.extend(tracks)
         self.assertGreater(len(playlist), 100)
+
+
+def fake_track(i: int, artist_id: str = 'a' * 22) -> dict:
+    return {'id': f'{i:022d}', 'name': f'Track {i}',
+            'artists': [{'id': artist_id, 'name': 'Artist'}],
+            'album': {'id': 'b' * 22, 'name': 'Album', 'images': []}}
+
+
+class FakeSpotify(HTTPAdapter):
+    """Stands in for the Spotify API, to test SpotifyAPI offline. It is mounted on the
+    session that the SpotifyAPI is given, and counts the requests it answers."""
+
+    def __init__(self, playlists: Optional[Dict[str, List[dict]]] = None,
+                 delay: float = 0.0) -> None:
+        super().__init__()
+        self.playlists = playlists or {}
+        self.delay = delay
+        self.refresh_token = 'refresh-token'
+        # An error status for the token endpoint to answer with, like 503.
+        self.token_error: Optional[int] = None
+        self.requests: List[requests.PreparedRequest] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def count(self, path: str) -> int:
+        """How many requests were made to ``path``."""
+        return sum(urlsplit(request.url).path == path for request in self.requests)
+
+    def batches(self, path: str) -> List[List[str]]:
+        """The ``ids`` sent in each request to ``path``."""
+        return [dict(parse_qsl(urlsplit(request.url).query))['ids'].split(',')
+                for request in self.requests if urlsplit(request.url).path == path]
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        with self._lock:
+            self.requests.append(request)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            status, body = self.route(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode()
+        response.url = request.url
+        response.request = request
+        return response
+
+    @staticmethod
+    def route_album(album_id: str) -> dict:
+        return {'id': album_id, 'name': 'Album', 'images': [],
+                'artists': [{'id': 'a' * 22, 'name': 'Artist'}], 'tracks': {'items': [], 'total': 0}}
+
+    def route(self, request: requests.PreparedRequest) -> Tuple[int, dict]:
+        url = urlsplit(request.url)
+        query = dict(parse_qsl(url.query))
+
+        if url.netloc == 'accounts.spotify.com':
+            body = request.body.decode() if isinstance(request.body, bytes) else request.body
+            form = dict(parse_qsl(body))
+            if self.token_error is not None:
+                return self.token_error, {'error': 'server_error'}
+            if form['grant_type'] == 'refresh_token' and form['refresh_token'] != self.refresh_token:
+                return 400, {'error': 'invalid_grant'}
+            return 200, {'access_token': 'access-token', 'expires_in': 3600,
+                         'refresh_token': self.refresh_token}
+
+        path = url.path.split('/')[2:]
+        if path[0] == 'playlists':
+            tracks = self.playlists[path[1]]
+            if request.method == 'PUT':
+                body = json.loads(request.body)
+                if 'uris' in body:
+                    tracks[:] = [fake_track(int(uri.split(':')[2])) for uri in body['uris']]
+                else:
+                    # Every index in the body refers to the playlist before the move.
+                    start = body['range_start']
+                    end = start + body['range_length']
+                    before = body['insert_before']
+                    kept = [(i, t) for i, t in enumerate(tracks) if not start <= i < end]
+                    tracks[:] = [t for i, t in kept if i < before] + tracks[start:end] \
+                        + [t for i, t in kept if i >= before]
+                return 200, {'snapshot_id': 'snapshot'}
+            if request.method == 'POST':
+                body = json.loads(request.body)
+                position = body.get('position', len(tracks))
+                tracks[position:position] = [fake_track(int(uri.split(':')[2])) for uri in body['uris']]
+                return 201, {'snapshot_id': 'snapshot'}
+            if len(path) == 2:
+                return 200, {'name': 'Playlist', 'images': [],
+                             'owner': {'id': 'owner', 'display_name': 'Owner'},
+                             'tracks': {'items': [{'track': t} for t in tracks[:100]],
+                                        'total': len(tracks)}}
+            offset = int(query.get('offset', 0))
+            page = tracks[offset:offset + int(query.get('limit', 100))]
+            return 200, {'items': [{'track': t} for t in page], 'total': len(tracks)}
+        # IDs that start with 'x' do not exist.
+        if path == ['artists']:
+            return 200, {'artists': [
+                None if _id.startswith('x') else
+                {'id': _id, 'name': 'Artist', 'images': [{'url': f'image:{_id}'}]}
+                for _id in query['ids'].split(',')]}
+        if path == ['tracks']:
+            return 200, {'tracks': [None if _id.startswith('x') else fake_track(int(_id))
+                                    for _id in query['ids'].split(',')]}
+        if path == ['albums']:
+            return 200, {'albums': [None if _id.startswith('x') else self.route_album(_id)
+                                    for _id in query['ids'].split(',')]}
+        if path[0] == 'tracks':
+            return 200, fake_track(int(path[1]))
+        if path[0] == 'albums':
+            return 200, self.route_album(path[1])
+        if path[0] == 'me':
+            return 200, {'id': 'me', 'display_name': 'Me', 'images': []}
+        return 404, {'error': {'status': 404, 'message': 'Not found.'}}
+
+
+class TestSpotifyAPIOffline(unittest.TestCase):
+    """Tests that run against FakeSpotify instead of the real API."""
+
+    def make_api(self, fake: FakeSpotify, client_id: Optional[str] = None,
+                 **kwargs: Any) -> SpotifyAPI:
+        session = requests.Session()
+        session.mount('https://', fake)
+        # Every test gets its own instance, unless it asks for a client ID.
+        spoti = SpotifyAPI(client_id or self.id(), 'client-secret', session=session, **kwargs)
+        self.addCleanup(spoti.close)
+        return spoti
+
+    @staticmethod
+    def fake_prompt(spoti: SpotifyAPI) -> List[int]:
+        """Replace the browser authorization of ``spoti``, and count how often it happens."""
+        prompts: List[int] = []
+
+        def prompt() -> None:
+            prompts.append(1)
+            spoti._user_access_code = 'access-code'
+
+        spoti._prompt_user_auth = prompt
+        return prompts
+
+    def token_cache_path(self) -> str:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return os.path.join(directory.name, 'cache', 'token.json')
+
+    def test_get_many_request_cap(self) -> None:
+        playlists = {f'playlist{i}': [fake_track(j) for j in range(300)] for i in range(4)}
+        fake = FakeSpotify(playlists, delay=0.02)
+        spoti = self.make_api(fake, max_workers=2)
+
+        result = spoti.get_many(list(playlists), result_type=ResultType.PLAYLIST)
+        self.assertEqual([len(playlist) for playlist in result], [300] * 4)
+        # get_many() and the pages of each playlist share the same cap.
+        self.assertLessEqual(fake.max_in_flight, 2)
+
+    def test_token_cache(self) -> None:
+        path = self.token_cache_path()
+        fake = FakeSpotify()
+
+        spoti = self.make_api(fake, 'token-cache-client', token_cache=path)
+        prompts = self.fake_prompt(spoti)
+        spoti.get_me()
+        self.assertEqual(len(prompts), 1)
+        with open(path) as f:
+            self.assertEqual(json.load(f),
+                             {'client_id': 'token-cache-client', 'refresh_token': 'refresh-token'})
+        spoti.close()
+
+        # The next run refreshes the saved token instead of opening the browser.
+        spoti = self.make_api(fake, 'token-cache-client', token_cache=path)
+        prompts = self.fake_prompt(spoti)
+        spoti.get_me()
+        self.assertEqual(prompts, [])
+        spoti.close()
+
+        # A saved token of another app is ignored.
+        spoti = self.make_api(fake, 'other-client', token_cache=path)
+        self.assertEqual(spoti._user_refresh_token, '')
+
+    def test_token_cache_missing_or_corrupt(self) -> None:
+        path = self.token_cache_path()
+        spoti = self.make_api(FakeSpotify(), token_cache=path)
+        self.assertEqual(spoti._user_refresh_token, '')
+        spoti.close()
+
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('{not json')
+        spoti = self.make_api(FakeSpotify(), token_cache=path)
+        self.assertEqual(spoti._user_refresh_token, '')
+        prompts = self.fake_prompt(spoti)
+        spoti.get_me()
+        self.assertEqual(len(prompts), 1)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['refresh_token'], 'refresh-token')
+
+    def test_token_cache_revoked(self) -> None:
+        path = self.token_cache_path()
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            json.dump({'client_id': self.id(), 'refresh_token': 'revoked-token'}, f)
+
+        fake = FakeSpotify()
+        spoti = self.make_api(fake, token_cache=path)
+        self.assertEqual(spoti._user_refresh_token, 'revoked-token')
+        prompts = self.fake_prompt(spoti)
+        # The refresh is rejected, so the user is asked again, and the new token saved.
+        self.assertEqual(spoti.get_me().id, 'me')
+        self.assertEqual(len(prompts), 1)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['refresh_token'], 'refresh-token')
+
+    @unittest.skipIf(os.name == 'nt', 'file modes are POSIX only')
+    def test_token_cache_permissions(self) -> None:
+        path = self.token_cache_path()
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('{}')
+        os.chmod(path, 0o644)
+
+        spoti = self.make_api(FakeSpotify(), token_cache=path)
+        self.fake_prompt(spoti)
+        spoti.get_me()
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+
+    def test_cache_ttl(self) -> None:
+        fake = FakeSpotify()
+        spoti = self.make_api(fake)
+        track_path = f'/v1/tracks/{1:022d}'
+        album_path = f'/v1/albums/{"c" * 22}'
+        clock = [1000.0]
+
+        with mock.patch('spotifyatlas.spotifyapi.time.monotonic', lambda: clock[0]):
+            spoti.get_track(f'{1:022d}')
+            spoti.get_album('c' * 22)
+            spoti.get_track(f'{1:022d}')
+            self.assertEqual(fake.count(track_path), 1)
+
+            # Tracks are kept for 5 minutes, albums (and artists) for an hour.
+            clock[0] += 299
+            spoti.get_track(f'{1:022d}')
+            self.assertEqual(fake.count(track_path), 1)
+            clock[0] += 2
+            spoti.get_track(f'{1:022d}')
+            spoti.get_album('c' * 22)
+            self.assertEqual(fake.count(track_path), 2)
+            self.assertEqual(fake.count(album_path), 1)
+
+            clock[0] += 3600
+            spoti.get_album('c' * 22)
+            self.assertEqual(fake.count(album_path), 2)
+
+    def test_cache_eviction(self) -> None:
+        fake = FakeSpotify()
+        spoti = self.make_api(fake)
+
+        with mock.patch.object(SpotifyAPI, '_cache_size', 3):
+            for i in range(3):
+                spoti.get_track(f'{i:022d}')
+            # Using the oldest entry makes it the most recent one.
+            spoti.get_track(f'{0:022d}')
+            spoti.get_track(f'{3:022d}')
+
+            # So the one evicted is the track 1.
+            spoti.get_track(f'{0:022d}')
+            spoti.get_track(f'{1:022d}')
+            self.assertEqual(fake.count(f'/v1/tracks/{0:022d}'), 1)
+            self.assertEqual(fake.count(f'/v1/tracks/{1:022d}'), 2)
+            self.assertEqual(len(spoti._cache), 3)
+
+    def test_cache_single_flight(self) -> None:
+        fake = FakeSpotify(delay=0.05)
+        spoti = self.make_api(fake, max_workers=16)
+        spoti.update_token()
+        url = f'https://open.spotify.com/track/{7:022d}?si=abc'
+        start = threading.Barrier(12)
+        results: List[Track] = []
+
+        def get() -> None:
+            start.wait()
+            results.append(spoti.get_track(url))
+
+        threads = [threading.Thread(target=get) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Everyone waited for the same request, and got the same object.
+        self.assertEqual(fake.count(f'/v1/tracks/{7:022d}'), 1)
+        self.assertEqual(len(results), 12)
+        self.assertTrue(all(track is results[0] for track in results))
+
+    def test_clear_playlist_snapshot(self) -> None:
+        fake = FakeSpotify({'playlist': [fake_track(i) for i in range(5)]})
+        spoti = self.make_api(fake)
+        self.fake_prompt(spoti)
+
+        playlist = spoti.get_playlist('playlist')
+        del playlist.tracks[1:]
+        # By default, the playlist is fetched again, so the tracks removed locally are
+        # still in the return value.
+        before = playlist.clear()
+        self.assertEqual(len(before), 5)
+        self.assertEqual(len(playlist), 0)
+        self.assertEqual(fake.playlists['playlist'], [])
+
+        fake.playlists['playlist'] = [fake_track(i) for i in range(5)]
+        playlist = spoti.get_playlist('playlist')
+        del playlist.tracks[1:]
+        requests_before = fake.count('/v1/playlists/playlist')
+        before = playlist.clear(use_loaded_tracks=True)
+        self.assertEqual(len(before), 1)
+        self.assertEqual(fake.count('/v1/playlists/playlist'), requests_before)
+
+    def test_playlist_rearrange_and_add(self) -> None:
+        fake = FakeSpotify({'playlist': [fake_track(i) for i in range(6)]})
+        spoti = self.make_api(fake)
+        self.fake_prompt(spoti)
+        playlist = spoti.get_playlist('playlist')
+
+        def assert_in_sync() -> None:
+            self.assertEqual([track.id for track in playlist.tracks],
+                             [track['id'] for track in fake.playlists['playlist']])
+
+        # Forward, backward, to both ends, and right next to the selection itself.
+        for range_start, range_length, insert_before in (
+                (0, 2, 4), (3, 2, 1), (1, 1, 6), (4, 2, 0), (2, 2, 4), (2, 2, 2)):
+            old_tracks = playlist.tracks
+            old_ids = [track.id for track in old_tracks]
+            playlist.rearrange(range_start, range_length, insert_before)
+            assert_in_sync()
+            # The list handed out before is left as it was.
+            self.assertEqual([track.id for track in old_tracks], old_ids)
+
+        # A generator is only gone through once, for both the request and the update.
+        playlist.add((Track.from_id(f'{i:022d}') for i in range(10, 13)), position=2)
+        assert_in_sync()
+        self.assertEqual(len(playlist), 9)
+
+    def test_add_to_playlist_batches(self) -> None:
+        fake = FakeSpotify({'playlist': [fake_track(i) for i in range(5)]})
+        spoti = self.make_api(fake)
+        self.fake_prompt(spoti)
+
+        tracks = [Track.from_id(f'{i:022d}') for i in range(100, 350)]
+        spoti.add_to_playlist('playlist', iter(tracks), position=3)
+        bodies = [json.loads(request.body) for request in fake.requests
+                  if request.method == 'POST' and urlsplit(request.url).path == '/v1/playlists/playlist/tracks']
+        # Each batch goes right after the one before it.
+        self.assertEqual([len(body['uris']) for body in bodies], [100, 100, 50])
+        self.assertEqual([body['position'] for body in bodies], [3, 103, 203])
+        self.assertEqual([track['id'] for track in fake.playlists['playlist']],
+                         [f'{i:022d}' for i in (0, 1, 2, *range(100, 350), 3, 4)])
+
+    def test_get_playlist_dedupe(self) -> None:
+        tracks = [fake_track(i) for i in range(150)]
+        # The same track on the first and second pages, and two local files.
+        tracks[120] = fake_track(3)
+        local_file = {'id': None, 'name': 'Demo', 'artists': [{'id': None, 'name': 'Me'}],
+                      'album': {'id': None, 'name': '', 'images': []}}
+        tracks[10] = tracks[130] = local_file
+        spoti = self.make_api(FakeSpotify({'playlist': tracks}))
+
+        self.assertEqual(len(spoti.get_playlist('playlist')), 150)
+        playlist = spoti.get_playlist('playlist', dedupe=True)
+        self.assertEqual(len(playlist), 149)
+        ids = [track.id for track in playlist]
+        self.assertEqual(ids.count(f'{3:022d}'), 1)
+        self.assertEqual(ids.index(f'{3:022d}'), 3)
+        self.assertEqual(ids.count(None), 2)
+
+    def test_prefetch_artists(self) -> None:
+        tracks = [fake_track(i, f'artist{i:016d}') for i in range(60)]
+        tracks.append({'id': None, 'name': 'Demo', 'artists': [{'id': None, 'name': 'Me'}],
+                       'album': {'id': None, 'name': '', 'images': []}})
+        fake = FakeSpotify({'playlist': tracks})
+        spoti = self.make_api(fake)
+        playlist = spoti.get_playlist('playlist')
+        playlist[0].artist._image_url = 'known'
+
+        spoti.prefetch_artists(playlist)
+        batches = fake.batches('/v1/artists')
+        # 59 artists without an image, in batches of 50. The local file is skipped.
+        self.assertEqual([len(batch) for batch in batches], [50, 9])
+        self.assertNotIn(playlist[0].artist.id, batches[0] + batches[1])
+
+        self.assertEqual(playlist[0].artist.image_url, 'known')
+        for track in playlist[1:60]:
+            self.assertEqual(track.artist._image_url, f'image:{track.artist.id}')
+        self.assertIsNone(playlist[60].artist._image_url)
+
+    def test_retried_methods(self) -> None:
+        spoti = SpotifyAPI(self.id(), 'client-secret')
+        self.addCleanup(spoti.close)
+        retry = spoti._session.get_adapter('https://api.spotify.com').max_retries
+        self.assertTrue(retry.is_retry('GET', 503))
+        # Moving a range of tracks (PUT) or adding them (POST) twice would change the playlist.
+        for method in ('POST', 'PUT', 'DELETE'):
+            self.assertFalse(retry.is_retry(method, 503))
+
+    def test_token_cache_transient_error(self) -> None:
+        path = self.token_cache_path()
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            json.dump({'client_id': self.id(), 'refresh_token': 'refresh-token'}, f)
+
+        fake = FakeSpotify()
+        fake.token_error = 503
+        spoti = self.make_api(fake, token_cache=path)
+        prompts = self.fake_prompt(spoti)
+        # Not a revoked token, so the error goes to the caller instead of the browser.
+        with self.assertRaises(SpotifyAPIException):
+            spoti.get_me()
+        self.assertEqual(prompts, [])
+        self.assertEqual(spoti._user_refresh_token, 'refresh-token')
+
+        # Once the API is back, the saved token still works.
+        fake.token_error = None
+        self.assertEqual(spoti.get_me().id, 'me')
+        self.assertEqual(prompts, [])
+
+    def test_get_several(self) -> None:
+        fake = FakeSpotify()
+        spoti = self.make_api(fake)
+        missing = 'x' * 22
+
+        ids = [f'{i:022d}' for i in range(120, 0, -1)]
+        ids[60] = missing
+        tracks = spoti.get_tracks(ids)
+        self.assertEqual([len(batch) for batch in fake.batches('/v1/tracks')], [50, 50, 20])
+        # Same order as asked, with None for the one that does not exist.
+        self.assertIsNone(tracks[60])
+        self.assertEqual([track.id for i, track in enumerate(tracks) if i != 60],
+                         [_id for i, _id in enumerate(ids) if i != 60])
+
+        ids = [f'album{i:017d}' for i in range(45)] + [missing]
+        albums = spoti.get_albums(f'https://open.spotify.com/album/{_id}' for _id in ids)
+        self.assertEqual([len(batch) for batch in fake.batches('/v1/albums')], [20, 20, 6])
+        self.assertEqual([album.id for album in albums[:-1]], ids[:-1])
+        self.assertIsNone(albums[-1])
+
+        ids = [missing] + [f'artist{i:016d}' for i in range(51)]
+        artists = spoti.get_artists(ids)
+        self.assertEqual([len(batch) for batch in fake.batches('/v1/artists')], [50, 2])
+        self.assertIsNone(artists[0])
+        self.assertEqual([artist.id for artist in artists[1:]], ids[1:])
+        self.assertEqual(artists[1].image_url, f'image:{ids[1]}')
+
+
+class TestJSONBackends(unittest.TestCase):
+    """Each of the JSON libraries that baseapi can pick, forced by hiding the others."""
+
+    @staticmethod
+    def load_baseapi(*hidden: str) -> Any:
+        """Run a separate copy of the baseapi module as if ``hidden`` were not installed,
+        leaving the one that the package uses untouched."""
+        spec = importlib.util.spec_from_file_location('_baseapi_copy', baseapi.__file__)
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(sys.modules, {name: None for name in hidden}):
+            spec.loader.exec_module(module)
+        return module
+
+    def check_round_trip(self, module: Any) -> None:
+        data = {'uris': ['spotify:track:5fwSHlTEWpluwOM0Sxnh5k'], 'position': 0, 'name': 'Sundfør'}
+        encoded = module._dumps(data)
+        self.assertEqual(module._loads(encoded if isinstance(encoded, bytes) else encoded.encode()), data)
+        self.assertEqual(json.loads(encoded), data)
+
+    def test_orjson(self) -> None:
+        try:
+            import orjson
+        except ImportError:
+            self.skipTest('orjson is not installed')
+        module = self.load_baseapi()
+        self.assertIs(module._loads, orjson.loads)
+        self.check_round_trip(module)
+
+    def test_msgspec(self) -> None:
+        try:
+            import msgspec
+        except ImportError:
+            self.skipTest('msgspec is not installed')
+        module = self.load_baseapi('orjson')
+        self.assertIs(module._loads, msgspec.json.decode)
+        self.check_round_trip(module)
+
+    def test_json(self) -> None:
+        module = self.load_baseapi('orjson', 'msgspec')
+        self.assertIs(module._loads, json.loads)
+        self.check_round_trip(module)
@@ -0,0 +1,28 @@
+import unittest
+from spotifyatlas import Track
+from spotifyatlas.utils import get_id, add_params_to_url, parse_url_params
+
+
+class TestUtils(unittest.TestCase):
+    def test_get_id(self) -> None:
+        self.assertEqual(
+            get_id('https://open.spotify.com/playlist/6xTnvRqIKptVfgcT8gN4Bb?si=5f2b1e'),
+            '6xTnvRqIKptVfgcT8gN4Bb')
+        self.assertEqual(get_id('https://open.spotify.com/user/leocoronag'), 'leocoronag')
+        self.assertEqual(
+            get_id('https://open.spotify.com/intl-es/track/5fwSHlTEWpluwOM0Sxnh5k'),
+            '5fwSHlTEWpluwOM0Sxnh5k')
+        self.assertEqual(get_id('5fwSHlTEWpluwOM0Sxnh5k'), '5fwSHlTEWpluwOM0Sxnh5k')
+        self.assertEqual(get_id(Track('5fwSHlTEWpluwOM0Sxnh5k')), '5fwSHlTEWpluwOM0Sxnh5k')
+
+        with self.assertRaises(ValueError):
+            get_id('non_alnum_fake_id')
+        with self.assertRaises(ValueError):
+            get_id('https://open.spotify.com/')
+
+    def test_url_params(self) -> None:
+        params = {'code': 'a+b/c=', 'scope': 'playlist-modify-private playlist-modify-public'}
+        url = add_params_to_url('https://accounts.spotify.com/authorize', params)
+        self.assertEqual(parse_url_params(url), params)
+        self.assertEqual(parse_url_params('/?code=abc&state=xyz'), {'code': 'abc', 'state': 'xyz'})
+        self.assertEqual(parse_url_params('/'), {})